@@ -0,0 +1,154 @@
+import ast
+import hashlib
+import marshal
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+DANGEROUS_BUILTINS = {
+    "eval", "exec", "compile", "open", "__import__", "globals", "locals",
+    "vars", "getattr", "setattr", "delattr", "breakpoint", "memoryview",
+}
+DANGEROUS_MODULES = {
+    "os", "sys", "subprocess", "shutil", "socket", "ctypes", "importlib",
+    "multiprocessing", "threading", "signal", "pathlib", "pickle", "marshal",
+    "builtins", "resource", "gc", "inspect", "asyncio",
+}
+# Modules whose results depend only on their inputs. Anything else imported
+# (random, time, os, network, ...) makes a run unsafe to replay from cache.
+DETERMINISTIC_MODULES = {
+    "math", "cmath", "string", "itertools", "functools", "collections",
+    "operator", "re", "heapq", "bisect", "statistics", "fractions",
+    "decimal", "json", "copy", "dataclasses", "typing", "enum", "textwrap",
+    "array", "numbers", "abc",
+}
+IMPURE_BUILTINS = {"open", "id", "hash", "breakpoint", "__import__", "eval", "exec",
+                   "compile", "globals", "locals", "vars"}
+MAX_ENTRIES = 256
+
+_LOOPS = (ast.For, ast.AsyncFor, ast.While, ast.ListComp, ast.SetComp,
+          ast.DictComp, ast.GeneratorExp)
+
+
+@dataclass(frozen=True)
+class InputCall:
+    prompt: str
+    lineno: int
+    in_loop: bool
+    loop: int = None  # line of the outermost enclosing loop
+
+
+@dataclass
+class CodeAnalysis:
+    code_hash: str
+    syntax_error: str = None
+    inputs: list = field(default_factory=list)
+    imports: set = field(default_factory=set)
+    dangerous: set = field(default_factory=set)
+    dunder_attributes: set = field(default_factory=set)
+    impure_names: set = field(default_factory=set)
+    code_object: object = None
+
+    @property
+    def bytecode(self):
+        # Marshalled code object, so another interpreter of the same version
+        # (the sandbox workers) can run it without recompiling.
+        return marshal.dumps(self.code_object) if self.code_object else None
+
+    @property
+    def deterministic(self):
+        return (self.code_object is not None and not self.impure_names
+                and self.imports <= DETERMINISTIC_MODULES)
+
+    @property
+    def is_safe(self):
+        return not (self.syntax_error or self.unsafe_names)
+
+    @property
+    def unsafe_names(self):
+        # Builtins, dunder attributes and modules that make is_safe False.
+        return sorted(self.dangerous | self.dunder_attributes | (self.imports & DANGEROUS_MODULES))
+
+
+class _Visitor(ast.NodeVisitor):
+    def __init__(self, source, result):
+        self.source = source
+        self.result = result
+        self.loops = []
+
+    def _loop(self, node):
+        self.loops.append(node.lineno)
+        self.generic_visit(node)
+        self.loops.pop()
+
+    visit_For = visit_AsyncFor = visit_While = _loop
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _loop
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.result.imports.add(alias.name.split(".")[0])
+
+    def visit_ImportFrom(self, node):
+        if node.module and not node.level:
+            self.result.imports.add(node.module.split(".")[0])
+
+    def visit_Name(self, node):
+        if node.id in DANGEROUS_BUILTINS:
+            self.result.dangerous.add(node.id)
+        if node.id in IMPURE_BUILTINS:
+            self.result.impure_names.add(node.id)
+
+    def visit_Attribute(self, node):
+        if node.attr.startswith("__") and node.attr.endswith("__"):
+            self.result.dunder_attributes.add(node.attr)
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name) and node.func.id == "input":
+            self.result.inputs.append(InputCall(
+                prompt=self._prompt(node),
+                lineno=node.lineno,
+                in_loop=bool(self.loops),
+                loop=self.loops[0] if self.loops else None,
+            ))
+        self.generic_visit(node)
+
+    def _prompt(self, node):
+        if not node.args:
+            return ""
+        arg = node.args[0]
+        if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+            return arg.value
+        return ast.get_source_segment(self.source, arg) or ""
+
+
+def _analyze(code, code_hash):
+    result = CodeAnalysis(code_hash=code_hash)
+    try:
+        tree = ast.parse(code, filename="<user code>")
+        result.code_object = compile(tree, "<user code>", "exec")
+    except (SyntaxError, ValueError) as e:
+        result.syntax_error = str(e)
+        return result
+    _Visitor(code, result).visit(tree)
+    return result
+
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def analyze(code):
+    # One parse + compile per distinct source, shared by every rerun, the
+    # input form and the Run button.
+    code_hash = hashlib.sha256(code.encode()).hexdigest()
+    with _lock:
+        if code_hash in _cache:
+            _cache.move_to_end(code_hash)
+            return _cache[code_hash]
+    result = _analyze(code, code_hash)
+    with _lock:
+        _cache[code_hash] = result
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return result
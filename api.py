@@ -1,150 +1,325 @@
-# import streamlit as st
-# import requests
-# import re
-
-# st.title("Python Code Compiler (Piston API)")
-
-# default_code = """
-# a = int(input())
-# b = int(input())
-# print("Sum:", a + b)
-# print("Difference:", a - b)
-# print("Product:", a * b)
-# print("Quotient:", a / b if b != 0 else "undefined")
-# """
-
-# user_code = st.text_area("Paste your Python code here:", value=default_code, height=180)
-
-# # Count how many input() calls are in the code
-# input_count = len(re.findall(r'input\s*\(', user_code))
-
-# inputs = []
-# if input_count > 0:
-#     st.info(f"Your code requires {input_count} input value(s). Please provide them below (in order):")
-#     for i in range(input_count):
-#         user_val = st.text_input(f"Input value #{i+1}:")
-#         inputs.append(user_val)
-
-# if st.button("Run Code"):
-#     # Join all user inputs with newlines for stdin
-#     stdin = "\n".join(inputs) + ("\n" if inputs else "")
-#     response = requests.post(
-#         "https://emkc.org/api/v2/piston/execute",
-#         json={
-#             "language": "python3",
-#             "version": "3.10.0",
-#             "files": [
-#                 {"name": "main.py", "content": user_code}
-#             ],
-#             "stdin": stdin
-#         }
-#     )
-#     st.subheader("Output:")
-#     st.code(response.json()["run"]["stdout"])
-#     if response.json()["run"]["stderr"]:
-#         st.subheader("Errors:")
-#         st.code(response.json()["run"]["stderr"])
-
-
-# import streamlit as st
-# import requests
-# import tempfile
-
-# st.set_page_config(page_title="🧠 OCR Extractor", layout="centered")
-# st.title("📝 OCR Extractor using OCR.Space API")
-# st.write("Upload an image with handwritten or printed text, and we'll extract it using OCR.Space API!")
-
-# uploaded_file = st.file_uploader("📤 Upload an image", type=["png", "jpg", "jpeg"])
-
-# if uploaded_file is not None:
-#     st.image(uploaded_file, caption="Uploaded Image", use_container_width=True)
-
-#     with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as temp_file:
-#         temp_file.write(uploaded_file.read())
-#         temp_file_path = temp_file.name
-
-#     st.info("⏳ Sending image to OCR.Space...")
-
-#     with open(temp_file_path, 'rb') as image_file:
-#         url_api = "https://api.ocr.space/parse/image"
-#         payload = {
-#             'apikey': 'helloworld',
-#             'language': 'eng',
-#             'OCREngine': 2
-#         }
-#         response = requests.post(
-#             url_api,
-#             files={"filename": image_file},
-#             data=payload
-#         )
-
-#     result = response.json()
-
-#     try:
-#         extracted_text = result['ParsedResults'][0]['ParsedText']
-#         st.success("✅ Text Extracted!")
-#         # Show extracted text in an editable box
-#         edited_text = st.text_area("🖊️ Editable Extracted Text", value=extracted_text, height=200)
-#     except Exception as e:
-#         st.error("❌ Failed to extract text.")
-#         st.error(f"Error: {e}")
-
-import streamlit as st
-import requests
-import re
-import io
-import sys
-from contextlib import redirect_stdout
-
-st.set_page_config(page_title="Handwritten Code Executor", layout="centered")
-st.title("🧠 Handwritten Code Executor")
-st.write("Upload an image of your handwritten **Python code**, and this app will OCR it and safely execute it!")
-
-# OCR.space API
-OCR_API_URL = "https://api.ocr.space/parse/image"
-API_KEY = "helloworld"  # Free test key
-
-def extract_code_from_image(uploaded_img):
-    response = requests.post(
-        OCR_API_URL,
-        files={"filename": uploaded_img},
-        data={"apikey": API_KEY, "language": "eng", "isOverlayRequired": False},
-    )
-    result = response.json()
-    try:
-        return result['ParsedResults'][0]['ParsedText']
-    except Exception:
-        return "Error: Could not extract text."
+import argparse
+import base64
+import binascii
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Basic sanitization: block dangerous keywords
-def is_code_safe(code):
-    blocked = ["import", "os", "sys", "subprocess", "open", "eval", "__", "exec", "input"]
-    return not any(word in code for word in blocked)
+import metrics
+import pipeline
+from analysis import analyze
+from tesseract_profiles import PROFILES, set_profile
 
-def execute_code(code):
-    output = io.StringIO()
-    try:
-        with redirect_stdout(output):
-            exec(code, {})
-    except Exception as e:
-        return f"⚠️ Error: {e}"
-    return output.getvalue()
-
-uploaded_file = st.file_uploader("📤 Upload handwritten Python code image", type=["jpg", "jpeg", "png"])
-
-if uploaded_file:
-    st.image(uploaded_file, caption="Uploaded Image", use_container_width=True)
-    
-    with st.spinner("🔍 Extracting code via OCR..."):
-        code = extract_code_from_image(uploaded_file)
-
-    st.subheader("📝 Extracted Code:")
-    st.code(code, language="python")
-
-    if is_code_safe(code):
-        st.subheader("⚙️ Executed Output:")
-        result = execute_code(code)
-        st.text(result if result else "✅ Code ran with no output.")
+# Local HTTP API over the OCR -> refine -> execute pipeline:
+#
+#     POST /jobs               {"image": <base64>, "engine": "tesseract",
+#                               "inputs": ["5"], "execute": true}
+#                              -> 202 {"id": ..., "status": "queued"}
+#                              -> 429 when the queue is full
+#     GET  /jobs/<id>          status and per-stage timings
+#     GET  /jobs/<id>/result   200 with the result once finished, else 202
+#     GET  /health             queue depth and worker count
+#     GET  /metrics            stage timings and counters, Prometheus text
+#     GET  /metrics.json       the same as JSON
+#
+# Jobs asking to execute code that uses os, subprocess, open(), eval() and
+# the like (analysis.is_safe) fail without running unless the server was
+# started with --allow-unsafe.
+#
+# Stage timings are recorded with --metrics or PODEZ_METRICS=1.
+#
+# `python api.py --offline` serves against a local LLaVA stub (stubs.py) and
+# refines with the local repair fast path only, so no network is needed.
+
+MAX_BODY_BYTES = 20 * 1024 * 1024
+
+
+class QueueFull(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    image_bytes: bytes = field(repr=False)
+    engine: str
+    inputs: list = field(default_factory=list)
+    execute: bool = False
+    status: str = "queued"
+    submitted: float = field(default_factory=time.time)
+    text: str = ""
+    code: str = ""
+    used_llm: bool = False
+    output: str = None
+    error: str = None
+    timings: dict = field(default_factory=dict)
+    # Guards `timings`: the worker adds stages while handlers serialize it.
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.timings[stage] = round(seconds, 4)
+
+    def status_dict(self):
+        with self._lock:
+            timings = dict(self.timings)
+        return {"id": self.id, "status": self.status, "engine": self.engine,
+                "submitted": self.submitted, "timings": timings}
+
+    def result_dict(self):
+        return dict(self.status_dict(), text=self.text, code=self.code,
+                    used_llm=self.used_llm, output=self.output, error=self.error)
+
+
+class PipelineService:
+    # A bounded queue in front of a fixed set of worker threads. The heavy
+    # lifting already happens in the Tesseract and sandbox process pools;
+    # these threads just walk each job through the stages.
+    def __init__(self, engines=None, model_factory=None, workers=2, queue_depth=16,
+                 max_jobs=1000, allow_unsafe=False):
+        self.engines = engines or pipeline.ENGINES
+        self.model_factory = model_factory
+        self.allow_unsafe = allow_unsafe
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self._queue = queue.Queue(maxsize=queue_depth)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"api-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, image_bytes, engine, inputs=(), execute=False):
+        if engine not in self.engines:
+            raise ValueError(f"Unknown engine {engine!r}; choose from {sorted(self.engines)}")
+        job = Job(id=uuid.uuid4().hex, image_bytes=image_bytes, engine=engine,
+                  inputs=[str(value) for value in inputs], execute=execute)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise QueueFull(f"Queue is full ({self._queue.maxsize} jobs); retry shortly.") from None
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget_old_jobs()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "queued": self._queue.qsize(),
+                "queue_depth": self._queue.maxsize, "jobs": counts}
+
+    def _forget_old_jobs(self):
+        # Oldest finished jobs go first; queued and running ones are kept.
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:max(0, excess)]:
+            del self._jobs[job_id]
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            job.status = "running"
+            try:
+                self._run(job)
+            except Exception as e:
+                job.error = f"⚠️ {e}"
+            job.image_bytes = b""
+            job.status = "failed" if job.error else "done"
+            self._queue.task_done()
+
+    def _stage(self, job, name, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            job.record(name, elapsed)
+            metrics.observe(f"job.{name}", elapsed)
+
+    def _run(self, job):
+        job.record("queued", time.time() - job.submitted)
+        try:
+            image_bytes = self._stage(job, "preprocess", pipeline.preprocess_image, job.image_bytes)
+        except Exception as e:
+            job.error = f"⚠️ Could not read image: {e}"
+            return
+        job.text, job.error = self._stage(job, "ocr", self.engines[job.engine], image_bytes)
+        if job.error or not job.text:
+            job.error = job.error or "⚠️ No text found in the image."
+            return
+        job.code, job.used_llm = self._stage(job, "refine", self._refine, job.text)
+        if job.execute and job.code:
+            analysis = analyze(job.code)
+            if not self.allow_unsafe and not analysis.syntax_error and not analysis.is_safe:
+                job.error = f"⚠️ Not executed: the code uses {', '.join(analysis.unsafe_names)}."
+                return
+            job.output, job.error = self._stage(
+                job, "execute", pipeline.execute_python_code, job.code, job.inputs
+            )
+
+    def _refine(self, text):
+        if self.model_factory is None:
+            from local_repair import fast_path
+            code = fast_path(text)
+            return code or text, False
+        return pipeline.refine_code(text, self.model_factory)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if parts == ["health"]:
+            self._send(200, self.service.stats())
+            return
+        if parts == ["metrics"]:
+            self._send_text(200, metrics.prometheus_text())
+            return
+        if parts == ["metrics.json"]:
+            self._send(200, metrics.snapshot())
+            return
+        if len(parts) not in (2, 3) or parts[0] != "jobs" or parts[2:] not in ([], ["result"]):
+            self._send(404, {"error": "Not found"})
+            return
+        job = self.service.get(parts[1])
+        if job is None:
+            self._send(404, {"error": "Unknown job"})
+        elif len(parts) == 2:
+            self._send(200, job.status_dict())
+        elif job.finished:
+            self._send(200, job.result_dict())
+        else:
+            self._send(202, job.status_dict())
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send(404, {"error": "Not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_BODY_BYTES:
+            self._send(413, {"error": f"Body larger than {MAX_BODY_BYTES} bytes"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            image_bytes = base64.b64decode(body["image"], validate=True)
+            job = self.service.submit(
+                image_bytes,
+                body.get("engine", self.server.default_engine),
+                inputs=body.get("inputs", []),
+                execute=bool(body.get("execute", False)),
+            )
+        except QueueFull as e:
+            self._send(429, {"error": str(e)}, headers={"Retry-After": "1"})
+            return
+        except (ValueError, KeyError, TypeError, binascii.Error) as e:
+            self._send(400, {"error": f"Bad request: {e}"})
+            return
+        self._send(202, job.status_dict(), headers={"Location": f"/jobs/{job.id}"})
+
+    def _send_text(self, status, text):
+        data = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(service, host="127.0.0.1", port=8000, default_engine="tesseract"):
+    handler = type("Handler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.default_engine = default_engine
+    return server
+
+
+def offline_engines(reply):
+    # An LLaVA client pointed at the local stub. Not wrapped in cached_ocr so
+    # stub text never lands in the shared OCR cache.
+    from ollama_ocr import OllamaOCR
+    from stubs import OllamaStub
+    stub = OllamaStub(reply=reply).start()
+    return stub, {"stub": OllamaOCR(base_url=stub.url).extract}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP API over the OCR -> refine -> execute pipeline.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("-j", "--workers", type=int, default=2)
+    parser.add_argument("--queue-depth", type=int, default=16)
+    parser.add_argument("-e", "--engine", default=None, help="default engine for jobs that do not name one")
+    parser.add_argument("--no-refine", action="store_true", help="skip Gemini; only the local repair fast path runs")
+    parser.add_argument("--offline", action="store_true", help="serve against a local OCR stub, no network")
+    parser.add_argument("--metrics", action="store_true", help="record stage timings for /metrics")
+    parser.add_argument("--allow-unsafe", action="store_true",
+                        help="execute code that uses os, subprocess, open(), eval() and the like")
+    parser.add_argument("--stub-reply", default="n = int(input('n? '))\nprint(n * 2)")
+    parser.add_argument("--tesseract-profile", choices=sorted(PROFILES), default=None,
+                        help="Tesseract settings (default: $PODEZ_TESSERACT_PROFILE or code)")
+    args = parser.parse_args(argv)
+
+    if args.tesseract_profile:
+        set_profile(args.tesseract_profile)
+    if args.metrics:
+        metrics.enable()
+
+    stub = None
+    if args.offline:
+        stub, engines = offline_engines(args.stub_reply)
+        model_factory = None
     else:
-        st.warning("🚫 Unsafe code detected! Skipping execution for security reasons.")
+        engines = pipeline.ENGINES
+        model_factory = None if args.no_refine else pipeline.create_model
+    engine = args.engine or ("stub" if args.offline else "tesseract")
+    if engine not in engines:
+        parser.error(f"engine must be one of {sorted(engines)}")
+
+    service = PipelineService(engines, model_factory, workers=args.workers, queue_depth=args.queue_depth,
+                              allow_unsafe=args.allow_unsafe)
+    server = make_server(service, args.host, args.port, default_engine=engine)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} (engines: {', '.join(engines)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if stub is not None:
+            stub.stop()
+
 
+if __name__ == "__main__":
+    main()
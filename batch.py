@@ -0,0 +1,120 @@
+import io
+import os
+import queue
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+MAX_ZIP_MEMBERS = 500
+
+
+@dataclass
+class BatchItem:
+    name: str
+    image_bytes: bytes
+    stage: str = "queued"
+    text: str = ""
+    code: str = ""
+    error: str = None
+    timings: dict = field(default_factory=dict)
+
+    @property
+    def finished(self):
+        return self.stage in ("done", "failed")
+
+
+def iter_batch_inputs(files):
+    # files: iterable of (name, bytes). Zip archives are expanded in place;
+    # anything that is not an image is skipped.
+    for name, data in files:
+        if name.lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                members = [
+                    info for info in archive.infolist()
+                    if not info.is_dir()
+                    and not info.filename.startswith("__MACOSX/")
+                    and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+                ]
+                for info in members[:MAX_ZIP_MEMBERS]:
+                    yield info.filename, archive.read(info)
+        elif name.lower().endswith(IMAGE_EXTENSIONS):
+            yield name, data
+
+
+def run_batch(items, preprocess, ocr, refine, preprocess_workers=2,
+              ocr_workers=4, refine_workers=4):
+    # Each stage has its own executor, so one image can be refining while the
+    # next is in OCR and a third is being preprocessed. Yields an item every
+    # time it changes stage; the caller's thread is the only one that should
+    # touch the UI.
+    events = queue.Queue()
+    pre_pool = ThreadPoolExecutor(preprocess_workers, thread_name_prefix="batch-pre")
+    ocr_pool = ThreadPoolExecutor(ocr_workers, thread_name_prefix="batch-ocr")
+    refine_pool = ThreadPoolExecutor(refine_workers, thread_name_prefix="batch-refine")
+
+    def stage(item, name, func, arg, then):
+        item.stage = name
+        events.put((item, name))
+        start = time.perf_counter()
+        try:
+            result = func(arg)
+        except Exception as e:
+            result = e
+        item.timings[name] = time.perf_counter() - start
+        if isinstance(result, Exception):
+            fail(item, f"{name} failed: {result}")
+        else:
+            then(item, result)
+
+    def fail(item, error):
+        item.error = error
+        item.stage = "failed"
+        events.put((item, "failed"))
+
+    def after_preprocess(item, image_bytes):
+        ocr_pool.submit(stage, item, "ocr", ocr, image_bytes, after_ocr)
+
+    def after_ocr(item, result):
+        text, error = result
+        if error or not text:
+            fail(item, error or "OCR result is empty.")
+            return
+        item.text = text
+        refine_pool.submit(stage, item, "refine", refine, text, after_refine)
+
+    def after_refine(item, code):
+        item.code = code
+        item.stage = "done"
+        events.put((item, "done"))
+
+    try:
+        for item in items:
+            pre_pool.submit(stage, item, "preprocess", preprocess, item.image_bytes, after_preprocess)
+        remaining = len(items)
+        while remaining:
+            item, stage_name = events.get()
+            if stage_name in ("done", "failed"):
+                remaining -= 1
+            yield item
+    finally:
+        for pool in (pre_pool, ocr_pool, refine_pool):
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def build_archive(items):
+    output = io.BytesIO()
+    used = set()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for item in items:
+            if not item.code:
+                continue
+            stem = os.path.splitext(os.path.basename(item.name))[0] or "code"
+            name, n = f"{stem}.py", 1
+            while name in used:
+                n += 1
+                name = f"{stem}_{n}.py"
+            used.add(name)
+            archive.writestr(name, item.code + "\n")
+    return output.getvalue()
@@ -0,0 +1,300 @@
+# End-to-end benchmark: renders a corpus of Python snippets to images with
+# varied fonts, rotations, noise and blur, runs each OCR engine and the
+# refinement stage over it, and reports per-stage p50/p95, throughput,
+# peak RSS and character error rate against the ground truth.
+#
+#   python benchmarks/e2e_bench.py [--size 24] [--engines tesseract ocr.space llava]
+#                                  [--output run.json] [--compare previous.json]
+#
+# OCR.space, Ollama and Gemini are replaced by the local stubs in stubs.py,
+# so a run needs no network. The OCR stubs answer with the ground truth put
+# through synthetic OCR mistakes (their CER measures that simulation, not a
+# real engine); the Gemini stub answers with the ground truth. Tesseract is
+# real and is skipped when not installed.
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from preprocess_bench import SAMPLE_CODE
+from tesseract_profiles_bench import SAMPLES, cer
+
+SNIPPETS = [SAMPLE_CODE, *SAMPLES[1:], """class Stack:
+    def __init__(self):
+        self.items = []
+
+    def push(self, item):
+        self.items.append(item)
+
+    def pop(self):
+        return self.items.pop() if self.items else None""", """total = 0
+for line in ["3", "4", "5"]:
+    try:
+        total += int(line)
+    except ValueError:
+        print('skip', line)
+print("total:", total)""", """def fib(n):
+    a, b = 0, 1
+    while n > 0:
+        a, b = b, a + b
+        n -= 1
+    return a
+
+print([fib(i) for i in range(10)])"""]
+
+FONTS = ["DejaVuSansMono.ttf", "DejaVuSans.ttf", "DejaVuSerif.ttf", None]  # None: Pillow's default
+ROTATIONS = [0.0, -2.0, 3.5, -6.0]
+NOISE = [0.0, 8.0, 20.0]  # std dev of gaussian noise, grey levels
+BLUR = [0.0, 0.8, 1.6]
+STAGES = ("preprocess", "ocr", "refine")
+
+
+def load_font(name, size):
+    if name is None:
+        return ImageFont.load_default(size=size), "default"
+    try:
+        return ImageFont.truetype(name, size), name
+    except OSError:
+        return ImageFont.load_default(size=size), "default"
+
+
+def render(code, font_name, size, angle, noise, blur, rng):
+    font, font_name = load_font(font_name, size)
+    probe = ImageDraw.Draw(Image.new("L", (1, 1)))
+    left, top, right, bottom = probe.multiline_textbbox((0, 0), code, font=font, spacing=size // 2)
+    page = Image.new("L", (right + 120, bottom + 120), 245)
+    ImageDraw.Draw(page).multiline_text((60, 60), code, fill=25, font=font, spacing=size // 2)
+    if angle:
+        page = page.rotate(angle, expand=True, fillcolor=200, resample=Image.BICUBIC)
+    if blur:
+        page = page.filter(ImageFilter.GaussianBlur(blur))
+    if noise:
+        pixels = np.asarray(page, dtype=np.float32)
+        pixels += np.random.default_rng(rng.randrange(2 ** 32)).normal(0, noise, pixels.shape)
+        page = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    output = io.BytesIO()
+    page.convert("RGB").save(output, format="JPEG", quality=90)
+    return output.getvalue(), font_name
+
+
+def make_corpus(size, seed):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        code = SNIPPETS[i % len(SNIPPETS)]
+        params = {"font": rng.choice(FONTS), "size": rng.choice([24, 30, 36]),
+                  "angle": rng.choice(ROTATIONS), "noise": rng.choice(NOISE), "blur": rng.choice(BLUR)}
+        image_bytes, params["font"] = render(code, rng=rng, font_name=params.pop("font"), **params)
+        corpus.append({"name": f"img-{i:03d}", "image": image_bytes, "truth": code, "params": params})
+    return corpus
+
+
+def simulate_ocr(truth, rng, noise, keep_indent=False):
+    # The usual mistakes: indentation lost, curly quotes, l/1 and O/0 swaps
+    # and dropped colons, more of them on noisier images. The OCR.space stub
+    # gets the indentation and reports it only as word positions.
+    rate = 0.02 + noise / 400
+    out = []
+    for line in truth.splitlines():
+        if not keep_indent:
+            line = line.lstrip()
+        if line.endswith(":") and rng.random() < rate * 4:
+            line = line[:-1]
+        chars = []
+        for ch in line:
+            if ch == "'" and rng.random() < rate * 10:
+                ch = "’"
+            elif ch == '"' and rng.random() < rate * 10:
+                ch = "”"
+            elif ch in "1l0O" and rng.random() < rate:
+                ch = {"1": "l", "l": "1", "0": "O", "O": "0"}[ch]
+            chars.append(ch)
+        out.append("".join(chars))
+    return "\n".join(out)
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+def summarize(samples):
+    return {"p50": percentile(samples, 50), "p95": percentile(samples, 95),
+            "mean": statistics.mean(samples) if samples else None}
+
+
+def cpu_seconds():
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return self_usage.ru_utime + self_usage.ru_stime + children.ru_utime + children.ru_stime
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    scale = 1 / 1024 if sys.platform != "darwin" else 1 / 1024 ** 2
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale, 1),
+        "largest_child": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale, 1),
+    }
+
+
+def tesseract_available():
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def run_engine(engine, corpus, stubs, seed):
+    import pipeline
+    from tesseract_pool import shutdown_pool
+    rng = random.Random(seed)
+    # A model name per engine keeps refinements cached by an earlier pass
+    # from being replayed.
+    model = stubs["gemini"].model(f"stub-gemini-{engine}")
+    timings = {stage: [] for stage in STAGES}
+    cer_ocr, cer_refined, errors, llm = [], [], 0, 0
+    cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+    for item in corpus:
+        state = rng.getstate()
+        stubs["llava"].reply = simulate_ocr(item["truth"], rng, item["params"]["noise"])
+        rng.setstate(state)
+        stubs["ocr.space"].reply = simulate_ocr(item["truth"], rng, item["params"]["noise"], keep_indent=True)
+        stubs["gemini"].reply = item["truth"]
+
+        start = time.perf_counter()
+        image_bytes = pipeline.preprocess_image(item["image"])
+        timings["preprocess"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        text, error = pipeline.ENGINES[engine](image_bytes)
+        timings["ocr"].append(time.perf_counter() - start)
+        if error or not text:
+            errors += 1
+            continue
+        cer_ocr.append(cer(text, item["truth"]))
+
+        start = time.perf_counter()
+        code, used_llm = pipeline.refine_code(text, lambda: model)
+        timings["refine"].append(time.perf_counter() - start)
+        llm += used_llm
+        cer_refined.append(cer(code, item["truth"]))
+    wall = time.perf_counter() - wall_start
+    # Pool workers' CPU time is only accounted once they have exited.
+    shutdown_pool()
+    cpu = cpu_seconds() - cpu_start
+    done = len(corpus) - errors
+    return {
+        "images": len(corpus),
+        "errors": errors,
+        "stages": {stage: summarize(samples) for stage, samples in timings.items()},
+        "images_per_s": round(done / wall, 3) if wall else None,
+        "images_per_cpu_s": round(done / cpu, 3) if cpu else None,
+        "cer_ocr": round(statistics.mean(cer_ocr), 4) if cer_ocr else None,
+        "cer_refined": round(statistics.mean(cer_refined), 4) if cer_refined else None,
+        "llm_share": round(llm / done, 3) if done else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, previous=None):
+    print(f"{report['corpus']['size']} images, seed {report['corpus']['seed']}, "
+          f"peak RSS {report['peak_rss_mb']['self']} MB (largest child {report['peak_rss_mb']['largest_child']} MB)")
+    for engine, result in report["engines"].items():
+        if "skipped" in result:
+            print(f"\n{engine}: skipped ({result['skipped']})")
+            continue
+        old = (previous or {}).get("engines", {}).get(engine, {})
+        print(f"\n{engine}: {result['images_per_s']} images/s, {result['images_per_cpu_s']} images/s per core, "
+              f"CER ocr {result['cer_ocr']} -> refined {result['cer_refined']}, "
+              f"LLM share {result['llm_share']}, errors {result['errors']}")
+        for stage, stats in result["stages"].items():
+            if stats["p50"] is None:
+                continue
+            line = f"  {stage:<11} p50 {stats['p50'] * 1000:8.1f} ms   p95 {stats['p95'] * 1000:8.1f} ms"
+            before = old.get("stages", {}).get(stage, {}).get("p50")
+            if before:
+                line += f"   p50 {stats['p50'] / before - 1:+.0%} vs previous"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark on a synthetic corpus.")
+    parser.add_argument("--size", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--engines", nargs="*", default=["tesseract", "ocr.space", "llava"])
+    parser.add_argument("--stub-delay", type=float, default=0.0, help="seconds per stub reply / chunk")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="previous JSON report to compare p50s against")
+    args = parser.parse_args()
+
+    # Offline and uncached: fresh cache dir, no quota throttling, stubs in
+    # place of the remote engines. Set before the pipeline is imported.
+    from stubs import GeminiStub, OCRSpaceStub, OllamaStub
+    stubs = {"ocr.space": OCRSpaceStub(delay=args.stub_delay).start(),
+             "llava": OllamaStub(delay=args.stub_delay).start(),
+             "gemini": GeminiStub(delay=args.stub_delay).start()}
+    os.environ["PODEZ_CACHE_DIR"] = tempfile.mkdtemp(prefix="podez-bench-")
+    os.environ["PODEZ_OCRSPACE_RPM"] = "1000000"
+    os.environ["PODEZ_OCRSPACE_BURST"] = "1000000"
+    os.environ["PODEZ_OCRSPACE_URL"] = stubs["ocr.space"].endpoint
+    os.environ["OLLAMA_HOST"] = stubs["llava"].url
+
+    corpus = make_corpus(args.size, args.seed)
+    report = {
+        "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "git": git_revision(),
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "stub_delay": args.stub_delay},
+        "corpus": {"size": args.size, "seed": args.seed,
+                   "bytes": sum(len(item["image"]) for item in corpus),
+                   "params": [item["params"] for item in corpus]},
+        "engines": {},
+    }
+    try:
+        for engine in args.engines:
+            if engine in ("tesseract", "race") and not tesseract_available():
+                report["engines"][engine] = {"skipped": "tesseract not installed"}
+                continue
+            report["engines"][engine] = run_engine(engine, corpus, stubs, args.seed)
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+    report["peak_rss_mb"] = peak_rss_mb()
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+    print_report(report, previous)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Line-band parallel OCR (line_ocr.py) against a single Tesseract call per
+# page, on long synthetic pages, for a range of pool sizes.
+#
+#   python benchmarks/line_ocr_bench.py [--lines 40 120] [--workers 1 2 4] [--repeat 3]
+#
+# Without tesseract installed only the band splitting cost is reported.
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from e2e_bench import SNIPPETS
+from PIL import Image, ImageDraw, ImageFont
+from tesseract_profiles_bench import cer
+
+from line_ocr import recognize_lines
+from preprocess import line_bands, preprocess_image
+from tesseract_pool import TesseractPool
+from tesseract_profiles import PROFILES
+
+
+def long_page(lines):
+    source = []
+    while len(source) < lines:
+        for snippet in SNIPPETS:
+            source.extend(snippet.splitlines() + [""])
+    code = "\n".join(source[:lines])
+    font = ImageFont.truetype("DejaVuSansMono.ttf", 28) if _has_dejavu() else ImageFont.load_default(size=28)
+    page = Image.new("L", (1400, 80 + lines * 42), 255)
+    ImageDraw.Draw(page).multiline_text((40, 40), code, fill=0, font=font, spacing=14)
+    output = io.BytesIO()
+    page.save(output, format="PNG")
+    return preprocess_image(output.getvalue()), code
+
+
+def _has_dejavu():
+    try:
+        ImageFont.truetype("DejaVuSansMono.ttf", 10)
+        return True
+    except OSError:
+        return False
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples)
+
+
+def tesseract_available():
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark line-band parallel OCR.")
+    parser.add_argument("--lines", type=int, nargs="*", default=[40, 120])
+    parser.add_argument("--workers", type=int, nargs="*", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="code")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    profile = PROFILES[args.profile]
+    available = tesseract_available()
+
+    for lines in args.lines:
+        image_bytes, truth = long_page(lines)
+        gray = np.asarray(Image.open(io.BytesIO(image_bytes)).convert("L"))
+        bands, split_s = timed(lambda: line_bands(gray < 128), args.repeat)
+        print(f"{lines}-line page: {len(bands)} bands found in {split_s * 1000:.1f} ms")
+        if not available:
+            print("  tesseract not installed, skipping OCR timings")
+            continue
+        for workers in args.workers:
+            pool = TesseractPool(workers=workers)
+            try:
+                # Warm every worker so process start-up is not measured.
+                for future in [pool.submit(image_bytes, profile=profile) for _ in range(workers)]:
+                    future.result()
+                (text, _), single_s = timed(lambda: pool.recognize(image_bytes, profile=profile), args.repeat)
+                (lines_text, _), lines_s = timed(lambda: recognize_lines(image_bytes, pool, profile), args.repeat)
+            finally:
+                pool.shutdown()
+            print(f"  {workers:>2} workers  single {single_s * 1000:8.1f} ms (CER {cer(text, truth):.2%})"
+                  f"   lines {lines_s * 1000:8.1f} ms (CER {cer(lines_text, truth):.2%})"
+                  f"   speedup {single_s / lines_s:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
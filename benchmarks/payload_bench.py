@@ -0,0 +1,89 @@
+# Bytes on the wire and upload latency for OCR.space payloads: the raw
+# upload, the preprocessed PNG the pipeline sent before payload.py, and the
+# adaptive encoding.
+#
+#   python benchmarks/payload_bench.py [image ...] [--uplink-mbps 5] [--live]
+#
+# Without image arguments a small synthetic corpus of phone photos is used.
+# Latency is encode time plus transfer time at the given uplink; --live also
+# times real OCR.space requests (uses the shared free key, so sparingly).
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocess_bench import synthetic_photo, timed
+
+from payload import OCR_SPACE_MAX_BYTES, encode
+from preprocess import preprocess_image
+
+
+def corpus():
+    yield "photo 4032x3024", synthetic_photo()
+    yield "photo 3024x4032 rotated", synthetic_photo(size=(3024, 4032), angle=-5.0)
+    yield "photo 1600x1200", synthetic_photo(size=(1600, 1200), angle=1.0)
+
+
+def live_seconds(data, filename, mime):
+    from http_client import get_client
+    start = time.perf_counter()
+    response = get_client().post(
+        "ocr.space",
+        "https://api.ocr.space/parse/image",
+        data={"apikey": "helloworld", "language": "eng"},
+        files={"file": (filename, data, mime)},
+    )
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def bench(name, raw, args):
+    bytes_per_s = args.uplink_mbps * 1e6 / 8
+    processed, prep_s = timed(preprocess_image, raw, repeat=args.repeat)
+    payload, encode_s = timed(encode, processed, repeat=args.repeat)
+    rows = [
+        ("raw upload", len(raw), 0.0, (raw, "image.jpg", "image/jpeg")),
+        ("preprocessed png", len(processed), 0.0, (processed, "image.png", "image/png")),
+        (f"adaptive {payload.format} {payload.mode}", len(payload.data), encode_s,
+         (payload.data, payload.filename, payload.mime)),
+    ]
+    print(f"{name} (preprocess {prep_s * 1000:.0f} ms, encoded at {payload.size[0]}x{payload.size[1]})")
+    for label, size, cpu_s, upload in rows:
+        latency = cpu_s + size / bytes_per_s
+        over = "  over 1 MB limit" if size > OCR_SPACE_MAX_BYTES else ""
+        print(f"  {label:<22} {size:>11,} B  {latency * 1000:8.1f} ms{over}")
+        if args.live and size <= OCR_SPACE_MAX_BYTES:
+            samples = [live_seconds(*upload) for _ in range(args.live_repeat)]
+            print(f"  {'':<22} live OCR.space {statistics.median(samples) * 1000:8.1f} ms")
+    return len(processed), len(payload.data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR upload payload encoding.")
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--uplink-mbps", type=float, default=5.0)
+    parser.add_argument("--live", action="store_true")
+    parser.add_argument("--live-repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.images:
+        items = []
+        for path in args.images:
+            with open(path, "rb") as f:
+                items.append((path, f.read()))
+    else:
+        items = corpus()
+    before = after = 0
+    for name, raw in items:
+        old, new = bench(name, raw, args)
+        before += old
+        after += new
+    print(f"total vs preprocessed png: {before:,} -> {after:,} B ({1 - after / before:.0%} fewer)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Measures what the preprocessing stage costs and what it saves the OCR
+# engines downstream.
+#
+#   python benchmarks/preprocess_bench.py [image ...] [--repeat 5]
+#
+# Without image arguments a synthetic "phone photo" of printed code is used.
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from preprocess import preprocess_image
+
+SAMPLE_CODE = """def fizzbuzz(n):
+    for i in range(1, n + 1):
+        if i % 15 == 0:
+            print("FizzBuzz")
+        elif i % 3 == 0:
+            print("Fizz")
+        else:
+            print(i)
+
+fizzbuzz(int(input("n: ")))"""
+
+
+def synthetic_photo(size=(4032, 3024), angle=3.0):
+    page = Image.new("RGB", (1400, 900), (236, 232, 220))
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=34)
+    draw.multiline_text((60, 60), SAMPLE_CODE, fill=(30, 30, 40), font=font, spacing=14)
+    page = page.rotate(angle, expand=True, fillcolor=(200, 196, 186))
+    page = page.resize(size).filter(ImageFilter.GaussianBlur(1.5))
+    output = io.BytesIO()
+    page.save(output, format="JPEG", quality=92)
+    return output.getvalue()
+
+
+def timed(func, *args, repeat=5):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples)
+
+
+def tesseract_seconds(image_bytes, repeat):
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except Exception:
+        return None
+    image = Image.open(io.BytesIO(image_bytes))
+    return timed(pytesseract.image_to_string, image, repeat=repeat)[1]
+
+
+def bench(name, raw, repeat):
+    processed, prep_s = timed(preprocess_image, raw, repeat=repeat)
+    raw_size = Image.open(io.BytesIO(raw)).size
+    out_size = Image.open(io.BytesIO(processed)).size
+    print(f"{name}")
+    print(f"  preprocess        {prep_s * 1000:8.1f} ms")
+    print(f"  pixels            {raw_size[0] * raw_size[1]:>10,} -> {out_size[0] * out_size[1]:,}")
+    print(f"  bytes             {len(raw):>10,} -> {len(processed):,}")
+    raw_ocr = tesseract_seconds(raw, repeat)
+    if raw_ocr is None:
+        print("  tesseract         not installed, skipping OCR timings")
+        return
+    prep_ocr = tesseract_seconds(processed, repeat)
+    saved = raw_ocr - (prep_ocr + prep_s)
+    print(f"  tesseract raw     {raw_ocr * 1000:8.1f} ms")
+    print(f"  tesseract prep    {prep_ocr * 1000:8.1f} ms (+{prep_s * 1000:.1f} ms preprocess)")
+    print(f"  saved per image   {saved * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark image preprocessing.")
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if not args.images:
+        bench("synthetic 4032x3024 photo", synthetic_photo(), args.repeat)
+    for path in args.images:
+        with open(path, "rb") as f:
+            bench(path, f.read(), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Cold-import and Streamlit rerun latency for the app.
+#
+#   python benchmarks/startup_bench.py [--reruns 10] [--max-import-ms N] [--max-rerun-ms N]
+#
+# Exits non-zero when a --max-* budget is exceeded, so it can gate CI.
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("google.generativeai", "pytesseract", "PIL", "numpy", "requests", "toml")
+
+
+def import_profile(module):
+    # -X importtime writes "self | cumulative | name" rows to stderr.
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            rows.append((int(cumulative), name.rstrip()))
+        except ValueError:
+            continue
+    # Children are printed before their parent and indented two more spaces.
+    end = max(i for i, (_, name) in enumerate(rows) if name.strip() == module)
+    start = end
+    while start > 0 and rows[start - 1][1].startswith("   "):
+        start -= 1
+    own = rows[start:end]
+    direct = sorted(
+        ((us, name.strip()) for us, name in own if not name.startswith("     ")),
+        reverse=True,
+    )
+    heavy = sorted({name.strip() for _, name in own if name.strip().startswith(HEAVY)})
+    return rows[end][0] / 1000, direct[:8], heavy
+
+
+def rerun_latency(reruns):
+    from streamlit.testing.v1 import AppTest
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "secrets.toml"), "w") as f:
+            f.write('GEMINI_API_KEY = "benchmark"\n')
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            app = AppTest.from_file(os.path.join(ROOT, "v2.py"), default_timeout=60)
+            start = time.perf_counter()
+            app.run()
+            first = time.perf_counter() - start
+            samples = []
+            for _ in range(reruns):
+                start = time.perf_counter()
+                app.run()
+                samples.append(time.perf_counter() - start)
+        finally:
+            os.chdir(cwd)
+    return first * 1000, statistics.median(samples) * 1000, max(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import time and rerun latency.")
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-rerun-ms", type=float)
+    args = parser.parse_args()
+
+    failed = False
+    for module in ("pipeline", "v2"):
+        total_ms, top, heavy = import_profile(module)
+        print(f"import {module:<10} {total_ms:8.1f} ms")
+        for us, name in top:
+            print(f"    {us / 1000:8.1f} ms  {name}")
+        if module == "pipeline" and heavy:
+            print(f"    eagerly imported heavy modules: {', '.join(heavy)}")
+        if module == "pipeline" and args.max_import_ms and total_ms > args.max_import_ms:
+            print(f"    over budget ({args.max_import_ms} ms)")
+            failed = True
+
+    first_ms, median_ms, worst_ms = rerun_latency(args.reruns)
+    print(f"first run         {first_ms:8.1f} ms")
+    print(f"rerun median      {median_ms:8.1f} ms (max {worst_ms:.1f} ms over {args.reruns})")
+    if args.max_rerun_ms and median_ms > args.max_rerun_ms:
+        print(f"    over budget ({args.max_rerun_ms} ms)")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
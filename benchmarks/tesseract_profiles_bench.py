@@ -0,0 +1,113 @@
+# Recognition speed and character error rate per Tesseract profile (see
+# tesseract_profiles.py), to trade accuracy for throughput explicitly.
+#
+#   python benchmarks/tesseract_profiles_bench.py [--profiles code code-fast] [--repeat 3]
+#
+# Runs on synthetic renders of known code, so the ground truth is exact.
+# CER ignores leading indentation, which Tesseract does not reproduce.
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+from preprocess_bench import SAMPLE_CODE, synthetic_photo
+
+from preprocess import preprocess_image
+from tesseract_pool import _recognize
+from tesseract_profiles import PROFILES
+
+SAMPLES = [
+    SAMPLE_CODE,
+    """import math
+
+def area(r):
+    return math.pi * r ** 2
+
+values = [area(r) for r in range(1, 6)]
+print(f"total = {sum(values):.2f}")
+print({"max": max(values), 'min': min(values)})""",
+]
+
+
+def render(code, size=30):
+    font = ImageFont.load_default(size=size)
+    lines = code.count("\n") + 1
+    page = Image.new("L", (1300, 80 + lines * (size + 14)), 255)
+    ImageDraw.Draw(page).multiline_text((40, 40), code, fill=0, font=font, spacing=14)
+    output = io.BytesIO()
+    page.save(output, format="PNG")
+    return output.getvalue()
+
+
+def corpus():
+    for i, code in enumerate(SAMPLES):
+        yield f"render-{i}", render(code), code
+    yield "photo", preprocess_image(synthetic_photo()), SAMPLE_CODE
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def normalize(text):
+    return "\n".join(line.strip() for line in text.strip().splitlines() if line.strip())
+
+
+def cer(hypothesis, reference):
+    reference = normalize(reference)
+    return edit_distance(normalize(hypothesis), reference) / max(1, len(reference))
+
+
+def bench(profile, items, repeat):
+    seconds, errors = [], []
+    for _, image_bytes, truth in items:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            text, error = _recognize(image_bytes, "eng", "", profile)
+            samples.append(time.perf_counter() - start)
+            if error:
+                return error
+        seconds.append(statistics.median(samples))
+        errors.append(cer(text, truth))
+    return seconds, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Tesseract profiles.")
+    parser.add_argument("--profiles", nargs="*", default=sorted(PROFILES), choices=sorted(PROFILES))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except Exception:
+        print("tesseract not installed, nothing to measure")
+        return
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    items = list(corpus())
+    print(f"{'profile':<12} {'ms/image':>9} {'images/s':>9} {'CER':>7}")
+    for name in args.profiles:
+        result = bench(PROFILES[name], items, args.repeat)
+        if isinstance(result, str):
+            print(f"{name:<12} {result}")
+            continue
+        seconds, errors = result
+        mean_s = statistics.mean(seconds)
+        print(f"{name:<12} {mean_s * 1000:9.1f} {1 / mean_s:9.2f} {statistics.mean(errors):7.2%}")
+
+
+if __name__ == "__main__":
+    main()
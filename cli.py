@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict
+
+from batch import IMAGE_EXTENSIONS
+from local_repair import fast_path_share
+from pipeline import ENGINES, create_model, process_image
+from tesseract_profiles import PROFILES, set_profile
+
+
+def iter_images(directory):
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def run_file(path, engine, model):
+    with open(path, "rb") as f:
+        return process_image(f.read(), engine=engine, model=model, source=path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the OCR -> refine pipeline over a directory of code images."
+    )
+    parser.add_argument("directory")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("-e", "--engine", choices=sorted(ENGINES), default="tesseract")
+    parser.add_argument("--no-refine", action="store_true", help="skip Gemini; only the local repair fast path runs")
+    parser.add_argument("--tesseract-profile", choices=sorted(PROFILES), default=None,
+                        help="Tesseract settings (default: $PODEZ_TESSERACT_PROFILE or code)")
+    args = parser.parse_args(argv)
+
+    if args.tesseract_profile:
+        set_profile(args.tesseract_profile)
+
+    model = None if args.no_refine else create_model()
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    failed = 0
+    try:
+        with ThreadPoolExecutor(args.jobs) as executor:
+            # Keep at most 2x jobs in flight so a huge directory is not read
+            # into memory all at once.
+            pending = set()
+            for path in iter_images(args.directory):
+                if len(pending) >= args.jobs * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    failed += _write(out, done)
+                pending.add(executor.submit(run_file, path, args.engine, model))
+            failed += _write(out, wait(pending).done)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"local fast path: {fast_path_share():.0%} of refinements", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _write(out, futures):
+    failed = 0
+    for future in futures:
+        result = future.result()
+        failed += bool(result.error)
+        out.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+    out.flush()
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(main())
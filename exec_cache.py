@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 128
+DEFAULT_MAX_ENTRY_CHARS = 64 * 1024
+DEFAULT_MAX_TOTAL_CHARS = 4 * 1024 * 1024
+
+
+class ExecutionCache:
+    # Replayable sandbox event lists keyed by (code hash, inputs). Callers
+    # only store runs of code that analysis marked deterministic.
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_entry_chars=DEFAULT_MAX_ENTRY_CHARS,
+                 max_total_chars=DEFAULT_MAX_TOTAL_CHARS):
+        self.max_entries = max_entries
+        self.max_entry_chars = max_entry_chars
+        self.max_total_chars = max_total_chars
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(code_hash, user_inputs):
+        return code_hash, tuple(str(value) for value in user_inputs)
+
+    def get(self, key):
+        with self._lock:
+            events = self._entries.get(key)
+            if events is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return events
+
+    def put(self, key, events):
+        size = self._size(events)
+        if size > self.max_entry_chars:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._total -= self._size(self._entries.pop(key))
+            self._entries[key] = tuple(events)
+            self._total += size
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._total > self.max_total_chars):
+                _, evicted = self._entries.popitem(last=False)
+                self._total -= self._size(evicted)
+
+    @staticmethod
+    def _size(events):
+        return sum(len(payload or "") for _, payload in events)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "chars": self._total,
+                    "hits": self.hits, "misses": self.misses}
+
+
+_cache = ExecutionCache()
+
+
+def get_cache():
+    return _cache
@@ -0,0 +1,163 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    connect_timeout: float = 3.05
+    read_timeout: float = 15
+    retries: int = 2
+    backoff: float = 0.5
+    max_backoff: float = 8.0
+    # POSTs are only retried when the backend treats them as pure functions.
+    retry_post: bool = False
+    retry_statuses: frozenset = RETRY_STATUSES
+    # A read timeout means the backend took the request; retrying it spends
+    # quota and another full timeout.
+    retry_read_timeout: bool = True
+    failure_threshold: int = 5
+    reset_after: float = 30.0
+
+
+ENDPOINTS = {
+    # The free tier is rate limited: a 429 goes straight back to the caller
+    # (which falls back to Tesseract) and a slow request is not repeated.
+    "ocr.space": Endpoint(read_timeout=15, retry_post=True,
+                          retry_statuses=frozenset({502, 503, 504}), retry_read_timeout=False),
+    "ollama": Endpoint(read_timeout=120, retries=1, retry_post=True),
+    "piston": Endpoint(read_timeout=20, retries=1),
+    "default": Endpoint(),
+}
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class CircuitOpen(requests.ConnectionError):
+    pass
+
+
+class CircuitBreaker:
+    # Opens after `threshold` consecutive failures and rejects calls until
+    # `reset_after` has passed; then lets a single probe through.
+    def __init__(self, threshold, reset_after):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            self._probing = False
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.failures >= self.threshold or self.opened_at is not None:
+                    self.opened_at = time.monotonic()
+
+
+class HttpClient:
+    def __init__(self, endpoints=None, pool_size=16):
+        self.endpoints = dict(ENDPOINTS, **(endpoints or {}))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, name):
+        with self._lock:
+            if name not in self._breakers:
+                config = self.endpoints.get(name, self.endpoints["default"])
+                self._breakers[name] = CircuitBreaker(config.failure_threshold, config.reset_after)
+            return self._breakers[name]
+
+    def request(self, name, method, url, **kwargs):
+        config = self.endpoints.get(name, self.endpoints["default"])
+        breaker = self.breaker(name)
+        kwargs.setdefault("timeout", (config.connect_timeout, config.read_timeout))
+        retryable = method.upper() in IDEMPOTENT_METHODS or config.retry_post
+        attempts = 1 + (config.retries if retryable else 0)
+        for attempt in range(attempts):
+            if not breaker.allow():
+                metrics.count(f"http.{name}.circuit_open")
+                raise CircuitOpen(f"{name} is unavailable, not retrying for now")
+            if attempt:
+                metrics.count(f"http.{name}.retries")
+            try:
+                with metrics.span(f"http.{name}"):
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                breaker.record(False)
+                if attempt + 1 == attempts or (isinstance(e, requests.ReadTimeout)
+                                               and not config.retry_read_timeout):
+                    raise
+            except BaseException:
+                # Anything else (a broken chunked body, an interrupt) still
+                # settles the call, or a half-open probe would never end.
+                breaker.record(False)
+                raise
+            else:
+                if response.status_code not in config.retry_statuses:
+                    breaker.record(response.status_code < 500)
+                    return response
+                breaker.record(False)
+                if attempt + 1 == attempts:
+                    return response
+                response.close()
+            time.sleep(_backoff(config, attempt))
+
+    def get(self, name, url, **kwargs):
+        return self.request(name, "GET", url, **kwargs)
+
+    def post(self, name, url, **kwargs):
+        return self.request(name, "POST", url, **kwargs)
+
+
+def _backoff(config, attempt):
+    # "Full jitter": uniform over [0, min(cap, base * 2**attempt)].
+    return random.uniform(0, min(config.max_backoff, config.backoff * 2 ** attempt))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
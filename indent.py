@@ -0,0 +1,144 @@
+import statistics
+from dataclasses import dataclass
+
+# Rebuilds Python indentation from where each line starts on the page. Word
+# boxes come from Tesseract's image_to_data or OCR.space's text overlay;
+# line x-offsets are clustered into indentation levels, guided by what the
+# syntax allows (a block opener is followed by a deeper line, a plain
+# statement is not). Deterministic, so an OCR result that only lost its
+# indentation can compile without a round trip to the model.
+
+INDENT = "    "
+
+
+@dataclass
+class Line:
+    text: str
+    left: int
+    top: int
+    width: int
+    height: int
+    confidence: float = None  # 0-100, mean over the words
+    char_width: float = None
+
+
+def _line(words):
+    # words: (left, top, width, height, confidence, text), in reading order.
+    left = min(w[0] for w in words)
+    top = min(w[1] for w in words)
+    right = max(w[0] + w[2] for w in words)
+    bottom = max(w[1] + w[3] for w in words)
+    chars = sum(len(w[5]) for w in words)
+    confidences = [w[4] for w in words if w[4] is not None and w[4] >= 0]
+    return Line(
+        text=" ".join(w[5] for w in words),
+        left=left, top=top, width=right - left, height=bottom - top,
+        confidence=statistics.mean(confidences) if confidences else None,
+        char_width=sum(w[2] for w in words) / chars if chars else None,
+    )
+
+
+def lines_from_tesseract(data):
+    # `data` is image_to_data(..., output_type=Output.DICT).
+    grouped = {}
+    for i, text in enumerate(data["text"]):
+        if not text or not text.strip():
+            continue
+        key = (data["page_num"][i], data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        conf = float(data["conf"][i])
+        grouped.setdefault(key, []).append(
+            (data["left"][i], data["top"][i], data["width"][i], data["height"][i], conf, text.strip())
+        )
+    lines = [_line(sorted(words)) for words in grouped.values()]
+    return sorted(lines, key=lambda line: line.top)
+
+
+def lines_from_ocr_space(parsed_result):
+    # `parsed_result` is one entry of ParsedResults, requested with
+    # isOverlayRequired=true. OCR.space reports no per-word confidence.
+    overlay = (parsed_result.get("TextOverlay") or {}).get("Lines") or []
+    rows = []
+    for entry in overlay:
+        words = [(int(w["Left"]), int(w["Top"]), int(w["Width"]), int(w["Height"]), None, w["WordText"])
+                 for w in entry.get("Words", []) if w.get("WordText", "").strip()]
+        if words:
+            rows.append(words)
+    # OCR.space can split one printed line into several overlay lines when
+    # it has wide gaps; rejoin entries whose vertical centres are within
+    # half a line of each other.
+    rows.sort(key=lambda words: min(w[1] for w in words))
+    merged = []
+    for words in rows:
+        centre = statistics.mean(w[1] + w[3] / 2 for w in words)
+        height = statistics.mean(w[3] for w in words)
+        if merged and abs(centre - merged[-1][0]) < height / 2:
+            merged[-1][1].extend(words)
+        else:
+            merged.append([centre, list(words)])
+    return [_line(sorted(words)) for _, words in merged]
+
+
+def _code_part(text):
+    # Text before a comment, ignoring '#' inside simple string literals.
+    quote = None
+    for i, ch in enumerate(text):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch == "#":
+            return text[:i]
+    return text
+
+
+def _bracket_depth(text, depth):
+    for ch in _code_part(text):
+        if ch in "([{":
+            depth += 1
+        elif ch in ")]}" and depth:
+            depth -= 1
+    return depth
+
+
+def levels(lines):
+    # Offsets are clustered the way the tokenizer tracks indentation: a
+    # stack of the enclosing blocks' left edges (the running mean of their
+    # lines, so one sloppy line does not move a block). A line joins the
+    # nearest edge on the stack; a line after a block opener starts a new
+    # block, even if the writer did not move right.
+    if not lines:
+        return []
+    widths = [line.char_width for line in lines if line.char_width]
+    char_width = statistics.median(widths) if widths else statistics.median(l.height for l in lines) / 2
+
+    stack = [[lines[0].left, 1]]  # [sum of lefts, count] per open block
+    result = []
+    depth = 0
+    opens_block = False
+    for line in lines:
+        if depth:
+            # Continuation inside brackets: any indent is legal; keep a
+            # hanging one and leave the block stack alone.
+            result.append(len(stack))
+        else:
+            if opens_block and result:
+                edge = stack[-1][0] / stack[-1][1]
+                stack.append([max(line.left, edge + 2 * char_width), 1])
+            else:
+                while len(stack) > 1:
+                    inner = stack[-1][0] / stack[-1][1]
+                    outer = stack[-2][0] / stack[-2][1]
+                    if line.left >= (inner + outer) / 2:
+                        break
+                    stack.pop()
+                stack[-1][0] += line.left
+                stack[-1][1] += 1
+            result.append(len(stack) - 1)
+            opens_block = _code_part(line.text).rstrip().endswith(":")
+        depth = _bracket_depth(line.text, depth)
+    return result
+
+
+def reindent(lines):
+    return "\n".join(INDENT * level + line.text.strip() for line, level in zip(lines, levels(lines)))
@@ -0,0 +1,87 @@
+import io
+import statistics
+
+import numpy as np
+from PIL import Image
+
+from indent import INDENT, Line, levels
+from preprocess import line_bands
+from tesseract_pool import PoolBusy
+from tesseract_profiles import line_profile
+
+# Line-band OCR: the preprocessed page is cut into text-line bands with a
+# horizontal projection profile and the bands are recognized in parallel on
+# the Tesseract pool, one contiguous run of lines per worker. Lines are
+# stitched back in order, indented from their left offsets and separated by
+# blank lines where the page has vertical gaps.
+
+MIN_LINES = 8  # below this a single page call is as fast
+PAD = 0.2  # of the line height, above and below each band
+
+
+def _crop(gray, top, bottom, left, right, pad):
+    h, w = gray.shape
+    band = gray[max(0, top - pad):min(h, bottom + pad), max(0, left - pad):min(w, right + pad)]
+    output = io.BytesIO()
+    Image.fromarray(band).save(output, format="PNG")
+    return output.getvalue()
+
+
+def _chunks(items, parts):
+    size, extra = divmod(len(items), parts)
+    start = 0
+    for i in range(parts):
+        end = start + size + (i < extra)
+        if end > start:
+            yield items[start:end]
+        start = end
+
+
+def stitch(bands, texts):
+    # Indentation comes from each band's left edge via indent.levels, the
+    # same clustering used for word geometry.
+    if not bands:
+        return ""
+    lines = [
+        Line(text=text.strip(), left=left, top=top, width=right - left, height=bottom - top,
+             char_width=(right - left) / len(text.strip()) if len(text.strip()) >= 4 else None)
+        for (top, bottom, left, right), text in zip(bands, texts)
+    ]
+    pitches = [b[0] - a[0] for a, b in zip(bands, bands[1:])]
+    pitch = statistics.median(pitches) if pitches else None
+    out = []
+    for i, (line, level) in enumerate(zip(lines, levels(lines))):
+        if i and pitch:
+            # A gap of more than one line pitch is a blank line in the source.
+            out.extend([""] * max(0, round((line.top - lines[i - 1].top) / pitch) - 1))
+        out.append(INDENT * level + line.text)
+    return "\n".join(out)
+
+
+def recognize_lines(image_bytes, pool, profile, lang="eng", min_lines=MIN_LINES, timeout=None):
+    # (text, error) like the single-call path, which it defers to for short
+    # pages or a single worker. `timeout` bounds each wait for a queue slot
+    # (PoolBusy when it runs out).
+    gray = np.asarray(Image.open(io.BytesIO(image_bytes)).convert("L"))
+    bands = line_bands(gray < 128)
+    if len(bands) < min_lines or pool.workers < 2:
+        return pool.recognize(image_bytes, lang=lang, profile=profile, timeout=timeout)
+    height = statistics.median(bottom - top for top, bottom, _, _ in bands)
+    pad = max(2, round(PAD * height))
+    crops = [_crop(gray, *band, pad) for band in bands]
+    single = line_profile(profile)
+    futures = []
+    try:
+        for chunk in _chunks(crops, min(pool.workers, len(crops))):
+            futures.append(pool.submit_lines(chunk, lang=lang, profile=single, timeout=timeout))
+    except PoolBusy:
+        for future in futures:
+            future.cancel()
+        raise
+    texts = []
+    for future in futures:
+        chunk_texts, error = future.result()
+        if error:
+            return "", error
+        texts.extend(chunk_texts)
+    return stitch(bands, texts), None
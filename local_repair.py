@@ -0,0 +1,196 @@
+import re
+import threading
+import warnings
+
+# Deterministic fixes for the usual OCR confusions in source code. When the
+# repaired text compiles, the Gemini round trip can be skipped entirely.
+
+CHAR_FIXES = str.maketrans({
+    "‘": "'", "’": "'", "‚": "'", "‛": "'", "′": "'",
+    "“": '"', "”": '"', "„": '"', "‟": '"', "″": '"',
+    "–": "-", "—": "-", "−": "-",
+    "×": "*", "÷": "/",
+    " ": " ", " ": " ", "​": "",
+    "…": "...",
+})
+
+BLOCK_KEYWORDS = ("if", "elif", "else", "for", "while", "def", "class", "try",
+                  "except", "finally", "with", "async def", "async for", "async with")
+_BLOCK_RE = re.compile(r"^\s*(?:%s)\b" % "|".join(k.replace(" ", r"\s+") for k in BLOCK_KEYWORDS))
+_STRING_RE = re.compile(r"""("[^"\n]*"|'[^'\n]*')""")
+# A number OCR misread: starts with a real digit (1O, 1l). Tokens starting
+# with l, I or O are identifiers (l1, O2), never rewritten.
+_NUMERIC_RE = re.compile(r"\b[0-9][0-9lIO]*\b")
+
+_lock = threading.Lock()
+STATS = {"fast_path": 0, "llm": 0}
+
+
+def _fix_numbers(segment):
+    def fix(match):
+        return match.group(0).replace("l", "1").replace("I", "1").replace("O", "0")
+    return _NUMERIC_RE.sub(fix, segment)
+
+
+def _string_end(line, start, quote):
+    # Index just past the closing `quote`, or None if the line ends first.
+    i = start
+    while i < len(line):
+        if line[i] == "\\":
+            i += 2
+        elif line.startswith(quote, i):
+            return i + len(quote)
+        else:
+            i += 1
+    return None
+
+
+def _runs(lines):
+    # Each line as (starts_in_string, [(is_code, text), ...], ends_in_string).
+    # String literals, triple-quoted ones spanning lines included, and
+    # comments are not code. A small lexer rather than tokenize, which gives
+    # up on the unbalanced brackets and stray dedents OCR text is full of.
+    quote = None
+    result = []
+    for line in lines:
+        starts_in_string = quote is not None
+        runs = []
+        i = 0
+        while i < len(line):
+            if quote is None:
+                j = i
+                while j < len(line) and line[j] not in "#'\"":
+                    j += 1
+                if j > i:
+                    runs.append((True, line[i:j]))
+                if j == len(line):
+                    break
+                if line[j] == "#":
+                    runs.append((False, line[j:]))
+                    break
+                quote = line[j:j + 3] if line[j:j + 3] in ('"""', "'''") else line[j]
+                i, start = j, j + len(quote)
+            else:
+                start = i
+            end = _string_end(line, start, quote)
+            runs.append((False, line[i:end]))
+            if end is None:
+                # Unterminated single-quoted strings stop at the line end.
+                if len(quote) == 1:
+                    quote = None
+                break
+            quote = None
+            i = end
+        result.append((starts_in_string, runs, quote is not None))
+    return result
+
+
+def _strip_comment(line):
+    parts = _STRING_RE.split(line)
+    for i in range(0, len(parts), 2):
+        if "#" in parts[i]:
+            parts[i] = parts[i].split("#", 1)[0]
+            return "".join(parts[:i + 1])
+    return line
+
+
+def _bracket_depth(code, depth):
+    for ch in code:
+        if ch in "([{":
+            depth += 1
+        elif ch in ")]}" and depth:
+            depth -= 1
+    return depth
+
+
+def _has_colon(code):
+    # A ':' outside brackets (not ':='): the line already has its block
+    # colon, as in "if x: y = 1".
+    depth = 0
+    for i, ch in enumerate(code):
+        if ch in "([{":
+            depth += 1
+        elif ch in ")]}" and depth:
+            depth -= 1
+        elif ch == ":" and not depth and code[i + 1:i + 2] != "=":
+            return True
+    return False
+
+
+def _add_colon(line):
+    if not _BLOCK_RE.match(line):
+        return line
+    code = _strip_comment(line).rstrip()
+    if not code or code.endswith((":", "\\", ",", "(", "[", "{")):
+        return line
+    comment = line[len(_strip_comment(line)):]
+    return code + ":" + (" " + comment.lstrip() if comment else "")
+
+
+def _error_line(text):
+    # Line of the first syntax error, 0 if unknown, None if it compiles.
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            compile(text, "<ocr>", "exec")
+    except SyntaxError as e:
+        return e.lineno or 0
+    except ValueError:
+        return 0
+    return None
+
+
+def repair(text):
+    # Character fixes apply everywhere (curly quotes are what OCR makes of
+    # straight ones); number and colon fixes only to code, never to the
+    # inside of strings, docstrings or comments.
+    text = text.translate(CHAR_FIXES).replace("\r\n", "\n").replace("\r", "\n")
+    lines = []
+    colons = {}  # line index -> the line before its colon was added
+    depth = 0
+    for starts_in_string, runs, ends_in_string in _runs(text.split("\n")):
+        runs = [(is_code, _fix_numbers(piece) if is_code else piece) for is_code, piece in runs]
+        code = "".join(piece for is_code, piece in runs if is_code)
+        line = "".join(piece for _, piece in runs).expandtabs(4).rstrip()
+        # Not inside brackets (a comprehension's "for x in xs" clause) and
+        # not on a line that already has its colon.
+        if not starts_in_string and not ends_in_string and not depth and not _has_colon(code):
+            fixed = _add_colon(line)
+            if fixed != line:
+                colons[len(lines)] = line
+                line = fixed
+        depth = _bracket_depth(code, depth)
+        lines.append(line)
+    # A colon stays only if the line without it is where compiling fails.
+    # An earlier error hides that, and then the colon is kept.
+    for index, original in colons.items():
+        without = lines[:index] + [original] + lines[index + 1:]
+        error = _error_line("\n".join(without))
+        if error is None or error > index + 1:
+            lines[index] = original
+    return "\n".join(lines).strip("\n")
+
+
+def compiles(text):
+    return _error_line(text) is None
+
+
+def fast_path(text):
+    # Returns code that compiles without help from the model, or None.
+    for candidate in (text.strip("\n"), repair(text)):
+        if candidate.strip() and compiles(candidate):
+            _count("fast_path")
+            return candidate
+    _count("llm")
+    return None
+
+
+def _count(key):
+    with _lock:
+        STATS[key] += 1
+
+
+def fast_path_share():
+    with _lock:
+        total = STATS["fast_path"] + STATS["llm"]
+        return STATS["fast_path"] / total if total else 0.0
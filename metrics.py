@@ -0,0 +1,187 @@
+import functools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+# Timing spans and counters for the pipeline. Off unless PODEZ_METRICS=1
+# (or enable() is called): disabled, span() hands back a shared no-op
+# context manager and timed() costs one global lookup per call.
+#
+#     with metrics.span("ocr.tesseract"):
+#         ...
+#
+# snapshot() also folds in the hit/miss counters the caches and the local
+# repair fast path already keep, so they are not counted twice.
+
+WINDOW = 1024  # samples kept per span for percentiles
+
+_enabled = os.environ.get("PODEZ_METRICS") == "1"
+_NOOP = nullcontext()
+_lock = threading.Lock()
+_spans = {}
+_counters = {}
+
+
+class _Span:
+    __slots__ = ("samples", "count", "total")
+
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def span(name):
+    return _Timer(name) if _enabled else _NOOP
+
+
+def timed(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe(name, seconds):
+    if not _enabled:
+        return
+    with _lock:
+        if name not in _spans:
+            _spans[name] = _Span()
+        _spans[name].add(seconds)
+
+
+def count(name, n=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _collected_counters():
+    # Counters kept by other modules; only read from ones already imported
+    # so a metrics dump never pulls in the pipeline.
+    counters = {}
+    for module_name, prefix in (("ocr_cache", "ocr_cache"), ("refine_cache", "refine_cache"),
+                                ("exec_cache", "exec_cache")):
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        if module_name == "ocr_cache" and module._default_cache is None:
+            continue
+        stats = module.get_cache().stats()
+        counters[f"{prefix}_hits"] = stats["hits"]
+        counters[f"{prefix}_misses"] = stats["misses"]
+    local_repair = sys.modules.get("local_repair")
+    if local_repair is not None:
+        counters["refine_fast_path"] = local_repair.STATS["fast_path"]
+        counters["refine_llm"] = local_repair.STATS["llm"]
+    partial_refine = sys.modules.get("partial_refine")
+    if partial_refine is not None:
+        for key, value in partial_refine.STATS.items():
+            counters[f"refine_partial_{key}"] = value
+    return counters
+
+
+def _collected_spans():
+    spans = {}
+    pipeline = sys.modules.get("pipeline")
+    if pipeline is not None and pipeline.REFINE_TIMINGS:
+        timings = list(pipeline.REFINE_TIMINGS)
+        spans["gemini.first_chunk"] = [first for first, _ in timings]
+    partial_refine = sys.modules.get("partial_refine")
+    if partial_refine is not None and partial_refine.RECENT:
+        spans["refine.partial_saved"] = [entry["seconds_saved"] for entry in list(partial_refine.RECENT)]
+    return spans
+
+
+def snapshot():
+    with _lock:
+        spans = {name: (sorted(s.samples), s.count, s.total) for name, s in _spans.items()}
+        counters = dict(_counters)
+    for name, samples in _collected_spans().items():
+        spans[name] = (sorted(samples), len(samples), sum(samples))
+    counters.update(_collected_counters())
+    return {
+        "enabled": _enabled,
+        "spans": {
+            name: {
+                "count": n,
+                "sum": round(total, 6),
+                "p50": round(_percentile(ordered, 0.50), 6) if ordered else None,
+                "p95": round(_percentile(ordered, 0.95), 6) if ordered else None,
+            }
+            for name, (ordered, n, total) in sorted(spans.items())
+        },
+        "counters": dict(sorted(counters.items())),
+    }
+
+
+def _label(name):
+    return name.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text():
+    data = snapshot()
+    lines = [
+        "# HELP podez_span_seconds Time spent in a pipeline stage or external call.",
+        "# TYPE podez_span_seconds summary",
+    ]
+    for name, s in data["spans"].items():
+        label = _label(name)
+        for key, quantile in (("p50", "0.5"), ("p95", "0.95")):
+            if s[key] is not None:
+                lines.append(f'podez_span_seconds{{span="{label}",quantile="{quantile}"}} {s[key]}')
+        lines.append(f'podez_span_seconds_sum{{span="{label}"}} {s["sum"]}')
+        lines.append(f'podez_span_seconds_count{{span="{label}"}} {s["count"]}')
+    lines += ["# HELP podez_events_total Cache hits/misses and other pipeline events.",
+              "# TYPE podez_events_total counter"]
+    for name, value in data["counters"].items():
+        lines.append(f'podez_events_total{{event="{_label(name)}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,169 @@
+import functools
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.environ.get("PODEZ_CACHE_DIR", ".podez_cache")
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 7 * 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_results (
+    key TEXT PRIMARY KEY,
+    engine TEXT NOT NULL,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ocr_results_accessed ON ocr_results (accessed_at);
+"""
+
+
+def image_digest(image_bytes):
+    # Hash decoded pixels, so the same photo re-encoded or re-uploaded with
+    # different metadata still maps to one entry.
+    from PIL import Image, ImageOps
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        digest = hashlib.sha256(f"{image.width}x{image.height}".encode())
+        digest.update(image.tobytes())
+    except Exception:
+        digest = hashlib.sha256(image_bytes)
+    return digest.hexdigest()
+
+
+class OCRCache:
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.path = path or os.path.join(CACHE_DIR, "ocr.sqlite3")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        # One connection per thread and per process; SQLite connections must
+        # not cross a fork or be shared between Streamlit script threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def key(self, image_bytes, engine, config=None):
+        config_blob = json.dumps(config or {}, sort_keys=True, default=str)
+        raw = f"{engine}\0{config_blob}\0{image_digest(image_bytes)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT text, created_at FROM ocr_results WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None:
+            self.misses += 1
+            return None
+        text, created_at = row
+        if self.ttl and now - created_at > self.ttl:
+            conn.execute("DELETE FROM ocr_results WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+        conn.execute("UPDATE ocr_results SET accessed_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return text
+
+    def put(self, key, text, engine=""):
+        conn = self._connect()
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO ocr_results VALUES (?, ?, ?, ?, ?, ?)",
+                (key, engine, text, size, now, now),
+            )
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn, now):
+        if self.ttl:
+            conn.execute("DELETE FROM ocr_results WHERE created_at < ?", (now - self.ttl,))
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_results"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = conn.execute(
+            "SELECT key, size FROM ocr_results ORDER BY accessed_at ASC"
+        ).fetchall()
+        stale = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            stale.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM ocr_results WHERE key = ?", stale)
+
+    def clear(self):
+        self._connect().execute("DELETE FROM ocr_results")
+
+    def stats(self):
+        count, total = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_results"
+        ).fetchone()
+        return {"entries": count, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = OCRCache()
+        return _default_cache
+
+
+def cached_ocr(engine, config=None):
+    # Wraps an extractor returning (text, error). Only successful results are
+    # stored, so a transient API failure is retried on the next upload.
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(image_bytes, *args, **kwargs):
+            cache = get_cache()
+            key_config = dict(config or {}, args=args, **kwargs)
+            key = cache.key(image_bytes, engine, key_config)
+            text = cache.get(key)
+            if text is not None:
+                return text, None
+            text, error = func(image_bytes, *args, **kwargs)
+            if not error and text:
+                cache.put(key, text, engine)
+            return text, error
+        return wrapper
+    return decorator
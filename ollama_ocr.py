@@ -0,0 +1,86 @@
+import base64
+import io
+import json
+import os
+
+import requests
+
+from http_client import get_client
+
+OLLAMA_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+if not OLLAMA_URL.startswith("http"):
+    OLLAMA_URL = f"http://{OLLAMA_URL}"
+
+PROMPT = (
+    "Extract all visible text from this image. the text in image is python code "
+    "and just reply with code that is visible no other text"
+)
+
+
+class OllamaError(RuntimeError):
+    pass
+
+
+class OllamaOCR:
+    def __init__(self, base_url=OLLAMA_URL, model="llava", prompt=PROMPT, max_side=1024,
+                 keep_alive="30m", client=None):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.prompt = prompt
+        self.max_side = max_side
+        self.keep_alive = keep_alive
+        self.client = client or get_client()
+
+    def encode(self, image_bytes):
+        # Vision tokens scale with resolution; past ~1024px the model sees no
+        # more detail in a page of code, it just takes longer.
+        from PIL import Image, ImageOps
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes))).convert("RGB")
+        image.thumbnail((self.max_side, self.max_side))
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=85)
+        return base64.b64encode(output.getvalue()).decode()
+
+    def warm(self):
+        # A generate call without a prompt just loads the model and pins it
+        # in memory for keep_alive.
+        response = self.client.post(
+            "ollama",
+            f"{self.base_url}/api/generate",
+            json={"model": self.model, "keep_alive": self.keep_alive},
+        )
+        response.raise_for_status()
+
+    def stream(self, image_bytes):
+        response = self.client.post(
+            "ollama",
+            f"{self.base_url}/api/generate",
+            json={
+                "model": self.model,
+                "prompt": self.prompt,
+                "images": [self.encode(image_bytes)],
+                "stream": True,
+                "keep_alive": self.keep_alive,
+            },
+            stream=True,
+        )
+        with response:
+            if not response.ok:
+                raise OllamaError(response.text)
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get("error"):
+                    raise OllamaError(event["error"])
+                if event.get("response"):
+                    yield event["response"]
+                if event.get("done"):
+                    return
+
+    def extract(self, image_bytes):
+        try:
+            text = "".join(self.stream(image_bytes))
+        except (requests.RequestException, OllamaError, ValueError) as e:
+            return "", f"⚠️ LLaVA OCR failed: {e}"
+        return text.strip(), None
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import re
+import threading
+import warnings
+from collections import OrderedDict, deque
+
+# Partial refinement: when only a few lines of the OCR text are wrong, the
+# model gets those lines plus a little context instead of the whole program
+# and its corrections are spliced back in. Suspect lines are the ones
+# compile() stops at and, for engines that report it, lines read with low
+# confidence. plan() returns None when the whole program should be sent:
+# short programs, errors that cannot be pinned to a line (lost indentation,
+# an unterminated string) or suspects spread over most of the text.
+
+ENABLED = os.environ.get("PODEZ_PARTIAL_REFINE", "1") != "0"
+MIN_CONFIDENCE = float(os.environ.get("PODEZ_PARTIAL_MIN_CONFIDENCE", 75))  # 0-100
+CONTEXT = 2  # lines either side of a suspect line
+MIN_LINES = 8  # shorter programs are sent whole
+MAX_SHARE = 0.5  # of the lines; a bigger excerpt saves too little
+MAX_ERRORS = 8  # compile() passes before giving up
+CHARS_PER_TOKEN = 4.0  # until the model reports real counts
+
+PARTIAL_PROMPT = """
+    These numbered lines are excerpts of a Python program read by OCR.
+    Fix the OCR errors in the lines marked with '>'. Lines marked with '|' are context and are correct.
+    DO NOT explain anything. DO NOT change logic or language. Reply with only the '>' lines, corrected,
+    in the same "number> code" form and with the same indentation:
+{regions}
+    """
+
+_REPLY_RE = re.compile(r"^\s*(\d+)> ?(.*)$")
+
+_lock = threading.Lock()
+STATS = {"partial": 0, "rejected": 0, "whole": 0, "tokens_sent": 0, "tokens_saved": 0}
+# Per request: tokens sent and received, the estimate for the whole
+# program, and the seconds that saved.
+RECENT = deque(maxlen=256)
+
+_MAX_REMEMBERED = 256
+_confidences = OrderedDict()
+
+
+def _text_key(text):
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def remember_confidences(text, confidences):
+    # Engines that know per-line confidence (tesseract-layout) record it
+    # against the text they return; refinement looks it up by that text.
+    key = _text_key(text)
+    with _lock:
+        _confidences[key] = list(confidences)
+        _confidences.move_to_end(key)
+        while len(_confidences) > _MAX_REMEMBERED:
+            _confidences.popitem(last=False)
+
+
+def confidences_for(text):
+    with _lock:
+        return _confidences.get(_text_key(text))
+
+
+def _indent(line):
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _placeholder(lines, index):
+    # A statement of the same shape: a block opener if the next line is
+    # deeper, so compiling can go on past the bad line.
+    indent = _indent(lines[index])
+    following = next((line for line in lines[index + 1:] if line.strip()), "")
+    return indent + ("if True:" if len(_indent(following)) > len(indent) else "pass")
+
+
+def compile_errors(lines):
+    # Indexes of the lines compile() rejects, found by swapping each one for
+    # a placeholder and compiling again. None when an error does not move
+    # past its line, which means it is not local to it.
+    lines = list(lines)
+    found = []
+    for _ in range(MAX_ERRORS):
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                compile("\n".join(lines), "<ocr>", "exec")
+            return found
+        except SyntaxError as e:
+            index = (e.lineno or 0) - 1
+        except ValueError:
+            return None
+        if not 0 <= index < len(lines) or index in found:
+            return None
+        found.append(index)
+        lines[index] = _placeholder(lines, index)
+    return None
+
+
+def windows(suspects, count, context=CONTEXT):
+    # Merged [start, end) line ranges around the suspect lines.
+    ranges = []
+    for i in sorted(suspects):
+        start, end = max(0, i - context), min(count, i + context + 1)
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    return ranges
+
+
+def plan(text, confidences=None):
+    # (lines, suspect indexes) for a partial request, or None.
+    if not ENABLED:
+        return None
+    lines = text.split("\n")
+    if len(lines) < MIN_LINES:
+        return None
+    errors = compile_errors(lines)
+    if errors is None:
+        return None
+    suspects = set(errors)
+    if confidences and len(confidences) == len(lines):
+        suspects.update(i for i, confidence in enumerate(confidences)
+                        if confidence is not None and confidence < MIN_CONFIDENCE and lines[i].strip())
+    if not suspects:
+        return None
+    if sum(end - start for start, end in windows(suspects, len(lines))) > MAX_SHARE * len(lines):
+        return None
+    return lines, sorted(suspects)
+
+
+def prompt(lines, suspects):
+    marked = set(suspects)
+    regions = []
+    for start, end in windows(suspects, len(lines)):
+        regions.append("\n".join(f"{i + 1}{'>' if i in marked else '|'} {lines[i]}"
+                                 for i in range(start, end)))
+    return PARTIAL_PROMPT.format(regions="\n...\n".join(regions))
+
+
+def splice(lines, suspects, reply):
+    # Each marked line is replaced by what the model sent back for it (a
+    # number given twice means the line was split in two); lines it left
+    # out stay as they were. None unless the result compiles.
+    marked = set(suspects)
+    fixes = {}
+    for line in reply.splitlines():
+        match = _REPLY_RE.match(line)
+        if match and int(match.group(1)) - 1 in marked:
+            fixes.setdefault(int(match.group(1)) - 1, []).append(match.group(2).rstrip())
+    if not fixes:
+        return None
+    out = []
+    for i, line in enumerate(lines):
+        out.extend(fixes.get(i, [line]))
+    code = "\n".join(out).strip("\n")
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            compile(code, "<ocr>", "exec")
+    except (SyntaxError, ValueError):
+        return None
+    return code
+
+
+def estimate_tokens(text, chars_per_token=CHARS_PER_TOKEN):
+    return max(1, round(len(text) / chars_per_token))
+
+
+def record(tokens_in, tokens_out, full_in, full_out, first_chunk, seconds):
+    # Savings against sending the whole program. Time to the first chunk is
+    # paid either way; decoding time is scaled to a whole-program reply.
+    decode = max(0.0, seconds - first_chunk)
+    full_seconds = first_chunk + decode * full_out / max(1, tokens_out)
+    entry = {
+        "tokens_in": tokens_in, "tokens_out": tokens_out,
+        "full_tokens": full_in + full_out,
+        "tokens_saved": max(0, full_in + full_out - tokens_in - tokens_out),
+        "seconds": seconds,
+        "seconds_saved": max(0.0, full_seconds - seconds),
+    }
+    with _lock:
+        RECENT.append(entry)
+        STATS["tokens_sent"] += tokens_in + tokens_out
+        STATS["tokens_saved"] += entry["tokens_saved"]
+    return entry
+
+
+def count(key):
+    with _lock:
+        STATS[key] += 1
@@ -0,0 +1,97 @@
+import io
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from preprocess import estimate_line_height
+
+# Encodes an image for upload to a remote OCR service: 1-bit Group 4 TIFF
+# for binarized text, grayscale JPEG otherwise, downscaled (and for JPEG
+# requantized) only as far as the text stays legible, until it fits the
+# byte budget.
+
+OCR_SPACE_MAX_BYTES = 1024 * 1024  # free tier upload limit
+MIN_LINE_HEIGHT = 14  # px; below this glyphs start to merge
+MAX_SIDE = 2600
+MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "TIFF": "image/tiff"}
+EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "TIFF": "tif"}
+
+
+@dataclass
+class Payload:
+    data: bytes
+    format: str
+    mode: str
+    size: tuple
+    scale: float = 1.0
+
+    @property
+    def mime(self):
+        return MIME_TYPES[self.format]
+
+    @property
+    def filename(self):
+        return f"image.{EXTENSIONS[self.format]}"
+
+
+def _is_bilevel(gray):
+    # Binarized output from preprocess.py, allowing for a few
+    # antialiased pixels from a resize.
+    arr = np.asarray(gray)
+    extremes = np.count_nonzero((arr <= 16) | (arr >= 239))
+    return extremes >= 0.995 * arr.size
+
+
+def _encode_once(image, bilevel, quality):
+    output = io.BytesIO()
+    if bilevel:
+        # CCITT Group 4 is built for bilevel text: about a third the size of
+        # a 1-bit PNG and faster to write. PNG covers Pillow without libtiff.
+        mono = image.convert("1", dither=Image.Dither.NONE)
+        try:
+            mono.save(output, format="TIFF", compression="group4")
+            return output.getvalue(), "TIFF", "1"
+        except OSError:
+            output = io.BytesIO()
+            mono.save(output, format="PNG", optimize=True)
+            return output.getvalue(), "PNG", "1"
+    image.save(output, format="JPEG", quality=quality, optimize=True)
+    return output.getvalue(), "JPEG", "L"
+
+
+def _min_scale(image):
+    # Never shrink below the point where a line of text is MIN_LINE_HEIGHT
+    # pixels tall; without a measurable line height, stop at half size.
+    line_height = estimate_line_height(np.asarray(image) < 128)
+    return min(1.0, MIN_LINE_HEIGHT / line_height) if line_height else 0.5
+
+
+def encode(image_bytes, max_bytes=OCR_SPACE_MAX_BYTES, max_side=MAX_SIDE, quality=80):
+    image = Image.open(io.BytesIO(image_bytes))
+    if image.format == "JPEG":
+        image.draft("L", (max_side, max_side))
+    image = ImageOps.exif_transpose(image).convert("L")
+    image.thumbnail((max_side, max_side))
+    bilevel = _is_bilevel(image)
+
+    scale = 1.0
+    base = image
+    min_scale = None
+    while True:
+        data, fmt, mode = _encode_once(image, bilevel, quality)
+        if len(data) <= max_bytes:
+            break
+        if min_scale is None:
+            min_scale = _min_scale(base)
+        if scale * 0.8 >= min_scale:
+            scale *= 0.8
+            size = (max(1, round(base.width * scale)), max(1, round(base.height * scale)))
+            image = base.resize(size, Image.LANCZOS)
+        elif not bilevel and quality > 40:
+            quality -= 15
+        else:
+            # Best effort: the server may still reject it, but the text
+            # is not sacrificed to fit.
+            break
+    return Payload(data=data, format=fmt, mode=mode, size=image.size, scale=scale)
@@ -0,0 +1,477 @@
+import functools
+import hashlib
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import metrics
+from ocr_cache import cached_ocr
+from partial_refine import PARTIAL_PROMPT
+from refine_cache import cached_refinement
+from sandbox import SandboxBusy, get_pool as get_sandbox
+from tesseract_pool import SUBMIT_TIMEOUT, PoolBusy, get_pool
+from throttle import SingleFlight, TokenBucket
+
+MODEL_NAME = "gemini-2.0-flash"
+
+REFINE_PROMPT = """
+    Refine this Python code. Only correct syntax and structure errors.
+    DO NOT explain anything. DO NOT change logic or language. Just return valid Python code:
+    {extracted_text}
+    """
+
+
+# google.generativeai, requests, toml, PIL and numpy are imported inside the
+# functions that use them: they dominate cold start and most Streamlit
+# reruns never touch them.
+
+def load_gemini_api_key(path="secrets.toml"):
+    key = os.environ.get("GEMINI_API_KEY")
+    if key:
+        return key
+    import toml
+    secrets = toml.load(path)
+    return secrets.get("GEMINI_API_KEY")
+
+
+@functools.lru_cache(maxsize=4)
+def create_model(api_key=None, model_name=MODEL_NAME):
+    import google.generativeai as genai
+    genai.configure(api_key=api_key or load_gemini_api_key())
+    return genai.GenerativeModel(model_name=model_name)
+
+
+# The shared 'helloworld' key has a small quota. Identical images in flight
+# at the same time share one request, and requests queue for a token; when
+# the queue is longer than the latency budget, Tesseract answers instead.
+OCR_SPACE_THROTTLED = "⚠️ OCR.space quota exhausted for now."
+OCR_SPACE_CANCELLED = "⚠️ OCR.space request dropped: another engine answered first."
+_ocr_space_flights = SingleFlight()
+_ocr_space_bucket = TokenBucket(
+    rate=float(os.environ.get("PODEZ_OCRSPACE_RPM", 20)) / 60,
+    capacity=int(os.environ.get("PODEZ_OCRSPACE_BURST", 3)),
+)
+OCR_SPACE_MAX_WAIT = float(os.environ.get("PODEZ_OCRSPACE_MAX_WAIT", 4))
+OCR_SPACE_URL = os.environ.get("PODEZ_OCRSPACE_URL", "https://api.ocr.space/parse/image")
+
+
+@metrics.timed("ocr.ocr_space")
+def ocr_space_extract(image_bytes):
+    text, error = _ocr_space_request(image_bytes)
+    if error == OCR_SPACE_THROTTLED:
+        metrics.count("ocr_space.fallback")
+        return tesseract_extract(image_bytes)
+    return text, error
+
+
+@cached_ocr("ocr.space", {"language": "eng", "overlay": True})
+def _ocr_space_request(image_bytes):
+    key = hashlib.sha256(image_bytes).digest()
+    return _ocr_space_flights.do(key, _ocr_space_fetch, image_bytes, key)
+
+
+def _ocr_space_fetch(image_bytes, flight_key=None):
+    from http_client import get_client
+    from indent import lines_from_ocr_space, reindent
+    from payload import encode
+    from race import cancelled as race_cancelled
+    # Smallest legible encoding under the free tier's 1 MB upload limit.
+    upload = encode(image_bytes)
+    with metrics.span("ocr_space.quota_wait"):
+        acquired = _ocr_space_bucket.acquire(OCR_SPACE_MAX_WAIT)
+    if not acquired:
+        return "", OCR_SPACE_THROTTLED
+    if race_cancelled() and _ocr_space_flights.detach(flight_key):
+        # Another engine won the race while this one queued for quota, and
+        # no other session shares the request.
+        _ocr_space_bucket.refund()
+        return "", OCR_SPACE_CANCELLED
+    url = OCR_SPACE_URL
+    payload = {
+        'apikey': 'helloworld',
+        'language': 'eng',
+        # Word boxes let indent.py rebuild the indentation ParsedText drops.
+        'isOverlayRequired': True
+    }
+    files = {
+        'file': (upload.filename, upload.data, upload.mime)
+    }
+    try:
+        response = get_client().post("ocr.space", url, data=payload, files=files)
+        if response.status_code == 429:
+            _ocr_space_bucket.drain()
+            return "", OCR_SPACE_THROTTLED
+        result = response.json()
+    except Exception:
+        return "", "⚠️ OCR.space API failed or exceeded limit."
+    if result.get("IsErroredOnProcessing") or not result.get("ParsedResults"):
+        return "", "⚠️ OCR did not return enough valid code to process."
+    parsed = result["ParsedResults"][0]
+    lines = lines_from_ocr_space(parsed)
+    if lines:
+        return reindent(lines), None
+    return parsed.get("ParsedText", "").strip(), None
+
+
+@metrics.timed("ocr.tesseract")
+def tesseract_extract(image_bytes, profile=None):
+    # Uses the current profile from tesseract_profiles unless one is named;
+    # each profile has its own OCR cache entries.
+    from tesseract_profiles import PROFILES, get_profile
+    profile = PROFILES[profile] if profile else get_profile()
+    return _tesseract_extractor(profile)(image_bytes)
+
+
+@metrics.timed("ocr.tesseract_lines")
+def tesseract_lines_extract(image_bytes, profile=None):
+    # Line bands recognized in parallel across the pool; see line_ocr.py.
+    from tesseract_profiles import PROFILES, get_profile
+    profile = PROFILES[profile] if profile else get_profile()
+    return _tesseract_extractor(profile, mode="lines")(image_bytes)
+
+
+@metrics.timed("ocr.tesseract_layout")
+def tesseract_layout_extract(image_bytes, profile=None):
+    # Word boxes instead of plain text, re-indented from line offsets; see
+    # indent.py.
+    from tesseract_profiles import PROFILES, get_profile
+    profile = PROFILES[profile] if profile else get_profile()
+    return _tesseract_extractor(profile, mode="layout")(image_bytes)
+
+
+def _layout_text(image_bytes, profile):
+    from indent import lines_from_tesseract, reindent
+    from partial_refine import remember_confidences
+    from race import track
+    # Registered with the race (if any), which cancels it while still queued
+    # once another engine has won.
+    future = track(get_pool().submit_layout(image_bytes, lang="eng", profile=profile,
+                                            timeout=SUBMIT_TIMEOUT))
+    data, error = future.result()
+    if error:
+        return "", error
+    lines = lines_from_tesseract(data)
+    text = reindent(lines)
+    # Lets partial refinement send only the lines Tesseract was unsure of.
+    remember_confidences(text, [line.confidence for line in lines])
+    return text, None
+
+
+@functools.lru_cache(maxsize=None)
+def _tesseract_extractor(profile, mode="page"):
+    config = dict(profile.cache_config(), lang="eng")
+    if mode != "page":
+        config["mode"] = mode
+
+    @cached_ocr("tesseract", config)
+    def extract(image_bytes):
+        try:
+            if mode == "lines":
+                from line_ocr import recognize_lines
+                return recognize_lines(image_bytes, get_pool(), profile, timeout=SUBMIT_TIMEOUT)
+            if mode == "layout":
+                return _layout_text(image_bytes, profile)
+            return get_pool().recognize(image_bytes, lang="eng", profile=profile, timeout=SUBMIT_TIMEOUT)
+        except PoolBusy:
+            return "", "⚠️ OCR is busy right now, please retry in a moment."
+    return extract
+
+
+@metrics.timed("preprocess")
+def preprocess_image(image_bytes, config=None):
+    from preprocess import DEFAULT_CONFIG, preprocess_image as run
+    return run(image_bytes, config or DEFAULT_CONFIG)
+
+
+_llava = None
+
+
+@metrics.timed("ocr.llava")
+@cached_ocr("llava", {"model": "llava"})
+def llava_extract(image_bytes):
+    global _llava
+    from ollama_ocr import OllamaOCR
+    if _llava is None:
+        _llava = OllamaOCR()
+    return _llava.extract(image_bytes)
+
+
+def _race_tesseract(image_bytes):
+    # Layout mode, which knows how sure Tesseract was of each line; the race
+    # gets the mean as the engine's confidence.
+    from partial_refine import confidences_for
+    text, error = tesseract_layout_extract(image_bytes)
+    confidences = [c for c in confidences_for(text) or [] if c is not None]
+    return text, error, (sum(confidences) / len(confidences) / 100 if confidences else None)
+
+
+@metrics.timed("ocr.race")
+def race_extract(image_bytes, with_llava=None):
+    # Best-of-N: see race.py. LLaVA joins the race when PODEZ_RACE_LLAVA=1.
+    from race import race
+    if with_llava is None:
+        with_llava = os.environ.get("PODEZ_RACE_LLAVA") == "1"
+    # Tesseract is already racing, so OCR.space runs without its fallback.
+    engines = {"tesseract": _race_tesseract, "ocr.space": _ocr_space_request}
+    if with_llava:
+        engines["llava"] = llava_extract
+    result = race(image_bytes, engines)
+    return result.text, result.error
+
+
+ENGINES = {
+    "ocr.space": ocr_space_extract,
+    "tesseract": tesseract_extract,
+    "tesseract-lines": tesseract_lines_extract,
+    "tesseract-layout": tesseract_layout_extract,
+    "llava": llava_extract,
+    "race": race_extract,
+}
+
+
+def extract_text_from_image(image_bytes, engine="tesseract"):
+    try:
+        image_bytes = preprocess_image(image_bytes)
+    except Exception as e:
+        return "", f"⚠️ Could not read image: {e}"
+    return ENGINES[engine](image_bytes)
+
+
+def execute_python_code(code: str, user_inputs: list, on_prompt=None, timeout=None):
+    # Runs in a pre-forked, rlimited child interpreter; see sandbox.py.
+    output, error = [], None
+    for kind, payload in stream_python_code(code, user_inputs, timeout=timeout):
+        if kind == "prompt":
+            if on_prompt:
+                on_prompt(payload)
+        elif kind == "done":
+            error = payload
+        elif kind != "cached":
+            output.append(payload)
+    return "".join(output), error
+
+
+def stream_python_code(code: str, user_inputs: list, timeout=None):
+    # Like execute_python_code, but yields ("stdout" | "stderr" | "prompt",
+    # text) events as the program produces them, ending with ("done", error).
+    # A replayed result from the execution cache starts with ("cached", "").
+    from analysis import analyze
+    with metrics.span("analyze"):
+        analysis = analyze(code)
+    if analysis.syntax_error:
+        yield "done", analysis.syntax_error
+        return
+    cache = key = None
+    if analysis.deterministic:
+        from exec_cache import get_cache
+        cache = get_cache()
+        key = cache.key(analysis.code_hash, user_inputs)
+        events = cache.get(key)
+        if events is not None:
+            yield "cached", ""
+            yield from events
+            return
+    events = []
+    try:
+        with metrics.span("execute"):
+            for event in get_sandbox().stream(analysis.bytecode, user_inputs, timeout=timeout):
+                events.append(event)
+                yield event
+    except SandboxBusy as e:
+        yield "done", str(e)
+        return
+    # Only clean runs are stored: a timeout or crash says nothing about what
+    # the next run would print.
+    if cache is not None and events and events[-1] == ("done", None):
+        cache.put(key, events)
+
+
+class FenceExtractor:
+    # Pulls the first fenced code block out of a streamed model reply without
+    # rescanning what has already been seen. Until a fence shows up the reply
+    # is treated as bare code, which is what the model sends when it ignores
+    # the markdown convention.
+    def __init__(self):
+        self.buffer = ""
+        self.state = "start"
+        self.pos = 0
+        self.code_start = 0
+        self.code_end = None
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        if self.state == "start":
+            fence = self.buffer.find("```", self.pos)
+            if fence == -1:
+                self.pos = max(0, len(self.buffer) - 2)
+                return self.preview
+            newline = self.buffer.find("\n", fence)
+            if newline == -1:
+                self.pos = fence
+                return self.preview
+            self.state = "code"
+            self.code_start = self.pos = newline + 1
+        if self.state == "code":
+            fence = self.buffer.find("```", self.pos)
+            if fence == -1:
+                self.pos = max(self.code_start, len(self.buffer) - 2)
+            else:
+                self.state = "done"
+                self.code_end = fence
+        return self.preview
+
+    @property
+    def preview(self):
+        if self.state == "start":
+            return "" if "`" in self.buffer else self.buffer
+        end = self.code_end if self.state == "done" else len(self.buffer.rstrip("`"))
+        return self.buffer[self.code_start:end]
+
+    def finish(self):
+        if self.state == "start":
+            return self.buffer.strip()
+        return self.preview.strip()
+
+
+# (time to first chunk, total seconds) for recent refinements.
+REFINE_TIMINGS = deque(maxlen=256)
+
+
+@cached_refinement(REFINE_PROMPT)
+@metrics.timed("refine.gemini")
+def refine_code_with_gemini(model, extracted_text, on_chunk=None):
+    # on_chunk receives the code extracted so far each time a chunk arrives.
+    prompt = REFINE_PROMPT.format(extracted_text=extracted_text)
+    start = time.perf_counter()
+    first_chunk = None
+    extractor = FenceExtractor()
+    for chunk in model.generate_content(prompt, stream=True):
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. safety metadata) raise here.
+            continue
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        preview = extractor.feed(text or "")
+        if on_chunk:
+            on_chunk(preview)
+    total = time.perf_counter() - start
+    REFINE_TIMINGS.append((first_chunk if first_chunk is not None else total, total))
+    return extractor.finish()
+
+
+@cached_refinement(PARTIAL_PROMPT)
+@metrics.timed("refine.partial")
+def refine_code_partially(model, extracted_text, on_chunk=None):
+    # Sends only the suspect lines and their context; see partial_refine.py.
+    # Returns "" when the whole program has to go to refine_code_with_gemini.
+    import partial_refine
+    # Planned on the raw OCR text, not local_repair's output: a line repair
+    # rewrote would otherwise go out as "correct" context and be spliced
+    # back with the rewrite in it. The raw text is also what the line
+    # confidences were recorded against.
+    planned = partial_refine.plan(extracted_text.replace("\r\n", "\n"),
+                                  partial_refine.confidences_for(extracted_text))
+    if planned is None:
+        partial_refine.count("whole")
+        return ""
+    lines, suspects = planned
+    prompt = partial_refine.prompt(lines, suspects)
+    start = time.perf_counter()
+    first_chunk = usage = None
+    reply = []
+    for chunk in model.generate_content(prompt, stream=True):
+        usage = getattr(chunk, "usage_metadata", None) or usage
+        try:
+            text_part = chunk.text
+        except ValueError:
+            continue
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        reply.append(text_part or "")
+    total = time.perf_counter() - start
+    reply = "".join(reply)
+    code = partial_refine.splice(lines, suspects, reply)
+    if code is None:
+        partial_refine.count("rejected")
+        return ""
+    partial_refine.count("partial")
+    # Real token counts when the model reports them; they also calibrate
+    # the estimate for the whole-program request that was avoided.
+    tokens_in = getattr(usage, "prompt_token_count", 0)
+    tokens_out = getattr(usage, "candidates_token_count", 0)
+    chars_per_token = len(prompt) / tokens_in if tokens_in else partial_refine.CHARS_PER_TOKEN
+    partial_refine.record(
+        tokens_in or partial_refine.estimate_tokens(prompt),
+        tokens_out or partial_refine.estimate_tokens(reply),
+        partial_refine.estimate_tokens(REFINE_PROMPT.format(extracted_text=extracted_text), chars_per_token),
+        partial_refine.estimate_tokens(f"```python\n{code}\n```", chars_per_token),
+        first_chunk if first_chunk is not None else total, total,
+    )
+    if on_chunk:
+        on_chunk(code)
+    return code
+
+
+@metrics.timed("refine")
+def refine_code(extracted_text, model_factory, on_chunk=None):
+    # Local repair first; the model (built lazily by model_factory) only sees
+    # text that still does not compile, and only the suspect lines of it when
+    # the errors are local. Returns (code, used_llm).
+    from local_repair import fast_path
+    with metrics.span("refine.local"):
+        code = fast_path(extracted_text)
+    if code is not None:
+        return code, False
+    model = model_factory()
+    # A whole-program refinement already on file beats a new partial
+    # request; text whose partial attempt was rejected ends up here.
+    code = refine_code_with_gemini.cached(model, extracted_text)
+    if code is None:
+        code = refine_code_partially(model, extracted_text, on_chunk=on_chunk)
+    if code:
+        return code, True
+    return refine_code_with_gemini(model, extracted_text, on_chunk=on_chunk), True
+
+
+@dataclass
+class PipelineResult:
+    source: str
+    engine: str
+    text: str = ""
+    code: str = ""
+    error: str = None
+    timings: dict = field(default_factory=dict)
+
+
+def process_image(image_bytes, engine="tesseract", model=None, source=""):
+    # OCR -> refine for one image. Without a model only the local repair
+    # fast path runs, which keeps OCR-only backfills free of API calls.
+    result = PipelineResult(source=source, engine=engine)
+    start = time.perf_counter()
+    try:
+        image_bytes = preprocess_image(image_bytes)
+    except Exception as e:
+        result.error = f"⚠️ Could not read image: {e}"
+        return result
+    result.timings["preprocess"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result.text, result.error = ENGINES[engine](image_bytes)
+    result.timings["ocr"] = time.perf_counter() - start
+    if result.error or not result.text:
+        return result
+
+    start = time.perf_counter()
+    try:
+        if model is None:
+            from local_repair import fast_path
+            result.code = fast_path(result.text) or ""
+        else:
+            result.code, _ = refine_code(result.text, lambda: model)
+    except Exception as e:
+        result.error = f"⚠️ Refinement failed: {e}"
+    result.timings["refine"] = time.perf_counter() - start
+    return result
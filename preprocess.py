@@ -0,0 +1,201 @@
+import io
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image, ImageOps
+
+
+@dataclass(frozen=True)
+class PreprocessConfig:
+    grayscale: bool = True
+    binarize: bool = True
+    deskew: bool = True
+    denoise: bool = True
+    rescale: bool = True
+    target_dpi: int = 300
+    max_side: int = 2500
+    window: int = 31
+    threshold: float = 0.15
+    max_skew: float = 8.0
+    skew_step: float = 0.5
+
+
+DEFAULT_CONFIG = PreprocessConfig()
+
+
+def to_grayscale(image):
+    # ITU-R 601 luma in fixed point; weights sum to 256.
+    rgb = np.asarray(image.convert("RGB"), dtype=np.uint16)
+    gray = rgb[..., 0] * 77 + rgb[..., 1] * 150 + rgb[..., 2] * 29
+    return (gray >> 8).astype(np.uint8)
+
+
+def _box_sum(gray, window):
+    # Sum over a window x window neighbourhood from a summed-area table.
+    # Padding stays uint8 and the table is int32 unless the page is big
+    # enough to overflow it.
+    half = window // 2
+    padded = np.pad(gray, ((half + 1, half), (half + 1, half)), mode="edge")
+    dtype = np.int32 if padded.size * 255 < np.iinfo(np.int32).max else np.int64
+    integral = padded.cumsum(axis=0, dtype=dtype).cumsum(axis=1, dtype=dtype)
+    h, w = gray.shape
+    return (
+        integral[window:window + h, window:window + w]
+        - integral[:h, window:window + w]
+        - integral[window:window + h, :w]
+        + integral[:h, :w]
+    )
+
+
+def adaptive_binarize(gray, window=31, threshold=0.15):
+    # Bradley-Roth thresholding: a pixel is ink when it is darker than its
+    # local mean by more than `threshold`. Returns a boolean ink mask.
+    window = max(3, window | 1)
+    scale = np.float32((1.0 - threshold) / (window * window))
+    return gray < _box_sum(gray, window) * scale
+
+
+def estimate_skew(ink, max_skew=8.0, step=0.5, max_points=200_000):
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 50:
+        return 0.0
+    if len(ys) > max_points:
+        pick = np.random.default_rng(0).choice(len(ys), max_points, replace=False)
+        ys, xs = ys[pick], xs[pick]
+    ys = ys.astype(np.float32)
+    xs = xs.astype(np.float32)
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_skew, max_skew + step / 2, step):
+        theta = np.deg2rad(angle)
+        rows = np.round(ys * np.cos(theta) - xs * np.sin(theta)).astype(np.int64)
+        profile = np.bincount(rows - rows.min())
+        score = float(np.square(np.diff(profile)).sum())
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def remove_specks(ink, min_neighbours=2):
+    padded = np.pad(ink, 1).astype(np.uint8)
+    h, w = ink.shape
+    neighbours = sum(
+        padded[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+        for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+        if dy or dx
+    )
+    return ink & (neighbours >= min_neighbours)
+
+
+def estimate_line_height(ink):
+    profile = ink.sum(axis=1) > max(1, ink.shape[1] // 200)
+    edges = np.flatnonzero(np.diff(profile.astype(np.int8)))
+    if len(edges) < 2:
+        return None
+    starts = edges[::2] if profile[0] == 0 else edges[1::2]
+    ends = edges[1::2] if profile[0] == 0 else edges[2::2]
+    heights = (ends[:len(starts)] - starts[:len(ends)])
+    heights = heights[heights > 3]
+    return float(np.median(heights)) if len(heights) else None
+
+
+def line_bands(ink, merge_gap=0.3, min_height=0.35):
+    # (top, bottom, left, right) per text line from the horizontal projection
+    # profile. Gaps shorter than merge_gap line heights (i dots, broken
+    # strokes) are closed; bands under min_height line heights are specks.
+    profile = ink.sum(axis=1) > max(1, ink.shape[1] // 200)
+    padded = np.concatenate(([False], profile, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    runs = list(zip(edges[::2], edges[1::2]))
+    if not runs:
+        return []
+    height = float(np.median([end - start for start, end in runs]))
+    merged = [list(runs[0])]
+    for start, end in runs[1:]:
+        if start - merged[-1][1] < merge_gap * height:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    bands = []
+    for top, bottom in merged:
+        if bottom - top < min_height * height:
+            continue
+        left, right = _ink_extent(ink[top:bottom].sum(axis=0), height)
+        bands.append((int(top), int(bottom), left, right))
+    return bands
+
+
+def _ink_extent(columns, height):
+    # Horizontal extent of a line, ignoring stray marks (page borders, dust)
+    # more than a line height away that hold under 5% of its ink.
+    filled = np.flatnonzero(columns)
+    splits = np.flatnonzero(np.diff(filled) > height) + 1
+    groups = [g for g in np.split(filled, splits) if columns[g].sum() >= 0.05 * columns.sum()]
+    if not groups:
+        # Only scattered marks (dotted ruling): nothing to tell apart.
+        return int(filled[0]), int(filled[-1]) + 1
+    return int(groups[0][0]), int(groups[-1][-1]) + 1
+
+
+def _source_dpi(info, gray, config):
+    dpi = info.get("dpi", (0, 0))[0]
+    # Phone cameras stamp 72 dpi regardless of what was photographed.
+    if dpi and dpi >= 100:
+        return float(dpi)
+    # Line height only needs a rough mask: binarize a subsampled copy (about
+    # 1200 px on the long side) instead of the full image.
+    step = max(1, max(gray.shape) // 1200)
+    small = gray[::step, ::step]
+    line_height = estimate_line_height(adaptive_binarize(small, config.window // step, config.threshold))
+    if line_height:
+        line_height *= step
+    if not line_height:
+        return None
+    # A 10pt line of text is roughly 1/6 inch tall including ascenders.
+    return line_height * 6.0
+
+
+def preprocess_array(image, config=DEFAULT_CONFIG):
+    # Let the JPEG decoder skip resolution we would throw away anyway.
+    image.draft("RGB", (config.max_side, config.max_side))
+    image = ImageOps.exif_transpose(image)
+    dpi_info = image.info
+    if max(image.size) > config.max_side:
+        image = image.convert("RGB")
+        image.thumbnail((config.max_side, config.max_side), reducing_gap=2.0)
+    if not config.grayscale:
+        return np.asarray(image.convert("RGB"))
+    gray = to_grayscale(image)
+    if config.rescale:
+        source_dpi = _source_dpi(dpi_info, gray, config)
+        if source_dpi:
+            scale = min(4.0, max(0.25, config.target_dpi / source_dpi))
+            scale = min(scale, config.max_side / max(gray.shape))
+            if abs(scale - 1.0) > 0.1:
+                gray = _resize(gray, scale)
+    if not config.binarize:
+        return gray
+    ink = adaptive_binarize(gray, config.window, config.threshold)
+    if config.denoise:
+        ink = remove_specks(ink)
+    if config.deskew:
+        angle = estimate_skew(ink, config.max_skew, config.skew_step)
+        if abs(angle) >= config.skew_step:
+            rotated = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8)).rotate(
+                angle, resample=Image.NEAREST, expand=True, fillcolor=255
+            )
+            ink = np.asarray(rotated) < 128
+    return np.where(ink, 0, 255).astype(np.uint8)
+
+
+def _resize(gray, scale):
+    h, w = gray.shape
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return np.asarray(Image.fromarray(gray).resize(size, Image.LANCZOS))
+
+
+def preprocess_image(image_bytes, config=DEFAULT_CONFIG):
+    image = Image.open(io.BytesIO(image_bytes))
+    pixels = preprocess_array(image, config)
+    output = io.BytesIO()
+    Image.fromarray(pixels).save(output, format="PNG", optimize=False)
+    return output.getvalue()
@@ -0,0 +1,48 @@
+import multiprocessing
+import os
+import sys
+import threading
+import types
+
+# Streamlit executes the app as a synthetic __main__ module with __file__
+# set to the script. spawn/forkserver children re-run that file on startup,
+# which would import Streamlit and the whole app into every worker (or fail
+# outright when the script directory is not on sys.path). Worker processes
+# are therefore started while a bare __main__ is in place, with this
+# directory on the path they inherit so the worker modules still import.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+_main_lock = threading.Lock()
+
+
+def _start_method():
+    methods = multiprocessing.get_all_start_methods()
+    return "forkserver" if "forkserver" in methods else "spawn"
+
+
+_base_context = multiprocessing.get_context(_start_method())
+
+
+class _WorkerProcess(_base_context.Process):
+    @staticmethod
+    def _Popen(process_obj):
+        with _main_lock:
+            main = sys.modules.get("__main__")
+            path = sys.path
+            sys.modules["__main__"] = types.ModuleType("__main__")
+            if HERE not in path:
+                sys.path = path + [HERE]
+            try:
+                return _base_context.Process._Popen(process_obj)
+            finally:
+                sys.modules["__main__"] = main
+                sys.path = path
+
+
+class _WorkerContext(type(_base_context)):
+    Process = _WorkerProcess
+
+
+def worker_context():
+    return _WorkerContext()
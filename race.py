@@ -0,0 +1,157 @@
+import ast
+import contextvars
+import io
+import keyword
+import threading
+import tokenize
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+DEFAULT_THRESHOLD = 0.85
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(16, thread_name_prefix="ocr-race")
+        return _executor
+
+
+# The race an engine thread is running for. Engines hand the pool futures
+# they wait on to track(), so jobs still queued when the race is decided are
+# cancelled, and check cancelled() before spending API quota.
+_scope = contextvars.ContextVar("race_scope", default=None)
+
+
+class _Scope:
+    def __init__(self):
+        self.decided = False
+        self.futures = []
+        self.lock = threading.Lock()
+
+    def close(self):
+        with self.lock:
+            self.decided = True
+            futures, self.futures = self.futures, []
+        for future in futures:
+            future.cancel()
+
+
+def track(future):
+    scope = _scope.get()
+    if scope is not None:
+        with scope.lock:
+            if not scope.decided:
+                scope.futures.append(future)
+                return future
+        future.cancel()
+    return future
+
+
+def cancelled():
+    # True in an engine whose race already has its result.
+    scope = _scope.get()
+    return scope is not None and scope.decided
+
+
+def _run(scope, func, image_bytes):
+    _scope.set(scope)
+    return func(image_bytes)
+
+
+def parse_score(text):
+    # 1.0 when the text parses; otherwise the share of lines before the first
+    # syntax error, scaled down so a parsing result always wins.
+    try:
+        ast.parse(text)
+        return 1.0
+    except SyntaxError as e:
+        lines = max(1, text.count("\n") + 1)
+        return 0.5 * max(0, (e.lineno or 1) - 1) / lines
+    except (ValueError, RecursionError):
+        return 0.0
+
+
+def token_score(text):
+    # Share of tokens that look like Python: names, keywords, numbers,
+    # strings and operators, as opposed to ERRORTOKENs and stray glyphs.
+    good = total = 0
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(text).readline):
+            if token.type in (tokenize.NEWLINE, tokenize.NL, tokenize.INDENT,
+                              tokenize.DEDENT, tokenize.ENDMARKER, tokenize.COMMENT):
+                continue
+            total += 1
+            if token.type == tokenize.NAME:
+                good += token.string.isascii() or keyword.iskeyword(token.string)
+            elif token.type in (tokenize.NUMBER, tokenize.STRING, tokenize.OP):
+                good += 1
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass
+    return good / total if total else 0.0
+
+
+def score_result(text, confidence=None):
+    if not text or not text.strip():
+        return 0.0
+    confidence = 0.5 if confidence is None else confidence
+    return 0.6 * parse_score(text) + 0.25 * token_score(text) + 0.15 * confidence
+
+
+@dataclass
+class RaceResult:
+    engine: str = None
+    text: str = ""
+    score: float = 0.0
+    error: str = None
+    scores: dict = field(default_factory=dict)
+
+
+def race(image_bytes, engines, threshold=DEFAULT_THRESHOLD, timeout=None):
+    # Runs every engine at once and returns the first result scoring at least
+    # `threshold`, or the best one once all have finished. Engines return
+    # (text, error) or (text, error, confidence), confidence in 0-1. Once the
+    # race is decided, pool jobs the losers registered with track() are
+    # cancelled if still queued and cancelled() tells them to stop before
+    # spending quota; work already running finishes in the background and is
+    # ignored (its results still land in the OCR cache).
+    executor = _get_executor()
+    scope = _Scope()
+    # A fresh context per engine: executor threads are reused across races.
+    futures = {executor.submit(contextvars.Context().run, _run, scope, func, image_bytes): name
+               for name, func in engines.items()}
+    best = RaceResult()
+    errors = []
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                name = futures[future]
+                try:
+                    text, error, *rest = future.result()
+                except Exception as e:
+                    text, error, rest = "", str(e), []
+                if error:
+                    errors.append(f"{name}: {error}")
+                    best.scores[name] = 0.0
+                    continue
+                score = score_result(text, rest[0] if rest else None)
+                best.scores[name] = round(score, 3)
+                if score > best.score:
+                    best.engine, best.text, best.score = name, text, score
+            if best.score >= threshold:
+                break
+    finally:
+        scope.close()
+        for future in pending:
+            future.cancel()
+    if best.engine is None:
+        best.error = "; ".join(errors) or "⚠️ No OCR engine finished in time."
+    return best
@@ -0,0 +1,199 @@
+import functools
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from ocr_cache import CACHE_DIR
+
+DEFAULT_MAX_ENTRIES = 512
+# The disk tier has the same kind of caps as the OCR cache: entries, bytes
+# and age, least recently read evicted first.
+DEFAULT_MAX_DISK_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_TTL = 30 * 24 * 3600
+PERSIST = os.environ.get("PODEZ_REFINE_CACHE_DISK", "0") == "1"
+
+# The unbounded "refinements" table of earlier versions is dropped.
+_SCHEMA = """
+DROP TABLE IF EXISTS refinements;
+CREATE TABLE IF NOT EXISTS refine_results (
+    key TEXT PRIMARY KEY,
+    code TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refine_results_accessed ON refine_results (accessed_at);
+"""
+
+
+def normalize_text(text):
+    # Leading indentation is kept as-is because it changes what the model
+    # returns; everything else that OCR jitters on is folded away.
+    lines = []
+    for line in text.replace("\r\n", "\n").replace("\r", "\n").expandtabs(4).split("\n"):
+        body = line.lstrip(" ")
+        indent = line[:len(line) - len(body)]
+        lines.append(indent + re.sub(r"[ \t]+", " ", body).rstrip())
+    return "\n".join(lines).strip("\n")
+
+
+def prompt_version(template):
+    return hashlib.sha256(template.encode()).hexdigest()[:12]
+
+
+class RefineCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, path=None,
+                 max_disk_entries=DEFAULT_MAX_DISK_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connect().executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def key(self, text, model_name, version):
+        raw = f"{model_name}\0{version}\0{normalize_text(text)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key, count_miss=True):
+        # count_miss=False for a look ahead of the call that will count it.
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        if self.path:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT code, created_at FROM refine_results WHERE key = ?", (key,)
+            ).fetchone()
+            now = time.time()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM refine_results WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute("UPDATE refine_results SET accessed_at = ? WHERE key = ?", (now, key))
+                self._remember(key, row[0])
+                with self._lock:
+                    self.hits += 1
+                return row[0]
+        with self._lock:
+            self.misses += count_miss
+        return None
+
+    def put(self, key, code):
+        self._remember(key, code)
+        if self.path:
+            conn = self._connect()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO refine_results VALUES (?, ?, ?, ?, ?)",
+                    (key, code, len(code.encode("utf-8")), now, now),
+                )
+                self._evict(conn, now)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, conn, now):
+        if self.ttl:
+            conn.execute("DELETE FROM refine_results WHERE created_at < ?", (now - self.ttl,))
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM refine_results"
+        ).fetchone()
+        if count <= self.max_disk_entries and total <= self.max_bytes:
+            return
+        rows = conn.execute(
+            "SELECT key, size FROM refine_results ORDER BY accessed_at ASC"
+        ).fetchall()
+        stale = []
+        for key, size in rows:
+            if count <= self.max_disk_entries and total <= self.max_bytes:
+                break
+            stale.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM refine_results WHERE key = ?", stale)
+
+    def _remember(self, key, code):
+        with self._lock:
+            self._entries[key] = code
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            path = os.path.join(CACHE_DIR, "refine.sqlite3") if PERSIST else None
+            _default_cache = RefineCache(path=path)
+        return _default_cache
+
+
+def cached_refinement(template):
+    # Wraps refine(model, extracted_text). The prompt template is hashed into
+    # the key, so editing the prompt invalidates every earlier refinement.
+    version = prompt_version(template)
+
+    def decorator(func):
+        def key(model, extracted_text):
+            model_name = getattr(model, "model_name", type(model).__name__)
+            return get_cache().key(extracted_text, model_name, version)
+
+        @functools.wraps(func)
+        def wrapper(model, extracted_text, *args, **kwargs):
+            cache = get_cache()
+            cache_key = key(model, extracted_text)
+            code = cache.get(cache_key)
+            if code is not None:
+                return code
+            code = func(model, extracted_text, *args, **kwargs)
+            if code:
+                cache.put(cache_key, code)
+            return code
+
+        def cached(model, extracted_text):
+            # The stored result, if any, without calling the model.
+            return get_cache().get(key(model, extracted_text), count_miss=False)
+
+        wrapper.prompt_version = version
+        wrapper.cached = cached
+        return wrapper
+    return decorator
@@ -0,0 +1,269 @@
+import atexit
+import builtins
+import io
+import marshal
+import os
+import queue
+import sys
+import threading
+import time
+
+from procs import worker_context
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_CPU_SECONDS = 10
+DEFAULT_MEMORY_MB = 512
+DEFAULT_JOBS_PER_WORKER = 1
+MAX_OUTPUT_CHARS = 200_000
+
+
+class SandboxBusy(RuntimeError):
+    pass
+
+
+def _apply_limits(cpu_seconds, memory_mb):
+    try:
+        import resource
+    except ImportError:
+        return
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if cpu_seconds:
+        # RLIMIT_CPU counts the whole process lifetime, so each job gets a
+        # budget on top of what this worker has already used. Only the soft
+        # limit moves (SIGXCPU ends the job): an unprivileged process cannot
+        # raise its hard limit again for the next job.
+        used = resource.getrusage(resource.RUSAGE_SELF)
+        spent = int(used.ru_utime + used.ru_stime)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = spent + cpu_seconds
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+class _Channel(io.TextIOBase):
+    # File-like object that forwards writes to the parent as ("stdout", text)
+    # messages. Small writes are coalesced and pushed by a flusher thread, so
+    # chatty programs neither flood the pipe nor sit unseen in a buffer, and
+    # output past MAX_OUTPUT_CHARS is dropped instead of accumulating.
+    def __init__(self, conn, name, lock, budget):
+        self.conn = conn
+        self.name = name
+        self.lock = lock
+        self.budget = budget
+        self.buffer = []
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        text = str(text)
+        with self.lock:
+            remaining = self.budget[0]
+            if remaining <= 0:
+                return len(text)
+            if len(text) >= remaining:
+                self.buffer.append(text[:remaining] + "\n... output truncated ...\n")
+            else:
+                self.buffer.append(text)
+            self.budget[0] = remaining - len(text)
+        return len(text)
+
+    def flush(self):
+        with self.lock:
+            if self.buffer:
+                self.conn.send((self.name, "".join(self.buffer)))
+                self.buffer.clear()
+
+
+def _run_job(conn, code, user_inputs):
+    if isinstance(code, bytes):
+        code = marshal.loads(code)
+    lock = threading.Lock()
+    budget = [MAX_OUTPUT_CHARS]
+    stdout = _Channel(conn, "stdout", lock, budget)
+    stderr = _Channel(conn, "stderr", lock, budget)
+    stdin = io.StringIO("".join(f"{value}\n" for value in user_inputs))
+
+    def sandbox_input(prompt=""):
+        stdout.flush()
+        with lock:
+            conn.send(("prompt", str(prompt)))
+        line = stdin.readline()
+        if not line:
+            raise EOFError("EOF when reading a line")
+        return line.rstrip("\n")
+
+    done = threading.Event()
+
+    def flusher():
+        while not done.wait(0.05):
+            stdout.flush()
+            stderr.flush()
+
+    threading.Thread(target=flusher, daemon=True).start()
+    env_builtins = dict(builtins.__dict__, input=sandbox_input)
+    sys.stdout, sys.stderr, sys.stdin = stdout, stderr, stdin
+    error = None
+    try:
+        exec(code, {"__builtins__": env_builtins, "__name__": "__main__"})
+    except SystemExit as e:
+        # sys.exit() / sys.exit(0) is a clean finish, as in a script.
+        if isinstance(e.code, int) and e.code:
+            error = f"exited with code {e.code}"
+        elif e.code is not None and not isinstance(e.code, int):
+            error = str(e.code)
+    except BaseException as e:
+        error = str(e) or type(e).__name__
+    finally:
+        done.set()
+        sys.stdout, sys.stderr, sys.stdin = sys.__stdout__, sys.__stderr__, sys.__stdin__
+        stdout.flush()
+        stderr.flush()
+    conn.send(("done", error))
+
+
+def _worker_main(conn, cpu_seconds, memory_mb):
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        _apply_limits(cpu_seconds, memory_mb)
+        _run_job(conn, *job)
+
+
+class _Worker:
+    def __init__(self, context, cpu_seconds, memory_mb):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, cpu_seconds, memory_mb),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+class SandboxPool:
+    def __init__(self, workers=None, timeout=DEFAULT_TIMEOUT, cpu_seconds=DEFAULT_CPU_SECONDS,
+                 memory_mb=DEFAULT_MEMORY_MB, jobs_per_worker=DEFAULT_JOBS_PER_WORKER):
+        self.size = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.jobs_per_worker = jobs_per_worker
+        self._context = worker_context()
+        self._idle = queue.Queue()
+        self._closed = False
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        return _Worker(self._context, self.cpu_seconds, self.memory_mb)
+
+    def _replace(self, worker):
+        worker.kill()
+        if not self._closed:
+            self._idle.put(self._spawn())
+
+    def _release(self, worker, healthy):
+        worker.jobs += 1
+        if healthy and worker.jobs < self.jobs_per_worker:
+            self._idle.put(worker)
+        else:
+            # Start the replacement off the request path so the next run
+            # still finds a warm interpreter.
+            threading.Thread(target=self._replace, args=(worker,), daemon=True).start()
+
+    def stream(self, code, user_inputs=(), timeout=None, wait=30):
+        # `code` is source text or a marshalled code object. Yields ("stdout" | "stderr" | "prompt", text) events while the
+        # snippet runs, then ("done", error). A timeout or crash only costs
+        # the worker that ran it.
+        timeout = timeout or self.timeout
+        try:
+            worker = self._idle.get(timeout=wait)
+        except queue.Empty:
+            raise SandboxBusy("All code runners are busy") from None
+        healthy = False
+        try:
+            worker.conn.send((code, [str(value) for value in user_inputs]))
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not worker.conn.poll(remaining):
+                    yield "done", f"Timed out after {timeout:g} seconds"
+                    return
+                kind, payload = worker.conn.recv()
+                if kind == "done":
+                    healthy = True
+                    yield kind, payload
+                    return
+                yield kind, payload
+        except (EOFError, OSError):
+            yield "done", _crash_reason(worker.process)
+        finally:
+            self._release(worker, healthy)
+
+    def run(self, code, user_inputs=(), timeout=None, wait=30):
+        # Returns (output, error, prompts) once the snippet has finished.
+        output, prompts, error = [], [], None
+        for kind, payload in self.stream(code, user_inputs, timeout, wait):
+            if kind == "prompt":
+                prompts.append(payload)
+            elif kind == "done":
+                error = payload
+            else:
+                output.append(payload)
+        return "".join(output), error, prompts
+
+    def shutdown(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+
+
+def _crash_reason(process):
+    process.join(1)
+    code = process.exitcode
+    if code is not None and code < 0:
+        import signal
+        name = signal.Signals(-code).name
+        if name == "SIGXCPU":
+            return "CPU time limit exceeded"
+        return f"Program was killed ({name})"
+    if code:
+        return f"Program exited with code {code}"
+    return "Program crashed"
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(
+                workers=int(os.environ.get("PODEZ_EXEC_WORKERS", 0)) or None,
+                timeout=float(os.environ.get("PODEZ_EXEC_TIMEOUT", DEFAULT_TIMEOUT)),
+                cpu_seconds=int(os.environ.get("PODEZ_EXEC_CPU_SECONDS", DEFAULT_CPU_SECONDS)),
+                memory_mb=int(os.environ.get("PODEZ_EXEC_MEMORY_MB", DEFAULT_MEMORY_MB)),
+                jobs_per_worker=int(os.environ.get("PODEZ_EXEC_JOBS_PER_WORKER", DEFAULT_JOBS_PER_WORKER)),
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
@@ -0,0 +1,264 @@
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+# Local stand-ins for the external engines, for offline runs and benchmarks.
+# Each stub runs an HTTP server on 127.0.0.1 in a background thread:
+#
+#     with OllamaStub(reply="print('hi')") as stub:
+#         OllamaOCR(base_url=stub.url).extract(image_bytes)
+#
+# `reply` and `delay` can be changed while a stub is running.
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Pooled clients drop idle keep-alive connections when a stub stops.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _StubServer:
+    handler = None
+
+    def __init__(self, port=0):
+        self.requests = []
+        self._server = _QuietServer(("127.0.0.1", port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(self.handler):
+            def log_message(self, format, *args):
+                pass
+
+        Handler.stub = stub
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.stub.requests.append(body)
+        if "prompt" not in body:
+            self._send_json({"model": body.get("model"), "response": "", "done": True})
+            return
+        reply = self.stub.reply
+        if not body.get("stream", True):
+            time.sleep(self.stub.delay * len(self.stub.tokens(reply)))
+            self._send_json({"model": body.get("model"), "response": reply, "done": True})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in self.stub.tokens(reply):
+            time.sleep(self.stub.delay)
+            self._write_chunk({"model": body.get("model"), "response": token, "done": False})
+        self._write_chunk({"model": body.get("model"), "response": "", "done": True})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, event):
+        data = json.dumps(event).encode() + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class OllamaStub(_StubServer):
+    # Mimics Ollama's /api/generate, streaming `reply` as NDJSON tokens with
+    # `delay` seconds between them.
+    handler = _OllamaHandler
+
+    def __init__(self, reply="print('hello')", delay=0.0, port=0):
+        super().__init__(port)
+        self.reply = reply
+        self.delay = delay
+
+    @staticmethod
+    def tokens(reply):
+        return [reply[i:i + 4] for i in range(0, len(reply), 4)]
+
+
+class _OCRSpaceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path != "/parse/image":
+            self.send_error(404)
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.stub.requests.append(len(body))
+        time.sleep(self.stub.delay)
+        lines = self.stub.reply.splitlines()
+        parsed = {"ParsedText": "\r\n".join(line.strip() for line in lines), "FileParseExitCode": 1}
+        if b'name="isOverlayRequired"\r\n\r\nTrue' in body:
+            parsed["TextOverlay"] = {"Lines": self.stub.overlay(lines)}
+        payload = {"ParsedResults": [parsed], "OCRExitCode": 1, "IsErroredOnProcessing": False}
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class OCRSpaceStub(_StubServer):
+    # Mimics POST /parse/image, answering `reply` after `delay` seconds and
+    # recording the size of each upload. Like the real service, ParsedText
+    # loses indentation; the text overlay (isOverlayRequired) keeps it as
+    # word positions.
+    handler = _OCRSpaceHandler
+
+    def __init__(self, reply="print('hello')", delay=0.0, port=0):
+        super().__init__(port)
+        self.reply = reply
+        self.delay = delay
+
+    @property
+    def endpoint(self):
+        return f"{self.url}/parse/image"
+
+    @staticmethod
+    def overlay(lines, char_width=14, line_height=40):
+        # Word boxes as OCR.space reports them; leading spaces in `reply`
+        # become left offsets, the way indentation looks on a page.
+        result = []
+        for row, line in enumerate(lines):
+            x = 20 + (len(line) - len(line.lstrip())) * char_width
+            words = []
+            for word in line.split():
+                words.append({"WordText": word, "Left": x, "Top": 20 + row * line_height,
+                              "Width": len(word) * char_width, "Height": line_height - 10})
+                x += (len(word) + 1) * char_width
+            if words:
+                result.append({"LineText": " ".join(line.split()), "Words": words,
+                               "MaxHeight": line_height - 10, "MinTop": 20 + row * line_height})
+        return result
+
+
+class _GeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if not self.path.split("?")[0].endswith(":streamGenerateContent"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.stub.requests.append(body)
+        prompt = "".join(part.get("text", "") for content in body.get("contents", [])
+                         for part in content.get("parts", []))
+        truth = self.stub.reply.splitlines()
+        # A partial refinement prompt gets the '>' lines back from `reply`.
+        marked = [int(n) for n in re.findall(r"^(\d+)> ", prompt, re.MULTILINE)]
+        if marked:
+            reply = "\n".join(f"{n}> {truth[n - 1]}" for n in marked if n <= len(truth))
+        else:
+            reply = f"```python\n{self.stub.reply}\n```"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(reply), 16):
+            time.sleep(self.stub.delay)
+            event = {"candidates": [{"content": {"parts": [{"text": reply[i:i + 16]}]}}]}
+            if i + 16 >= len(reply):
+                event["usageMetadata"] = {"promptTokenCount": len(prompt) // 4 or 1,
+                                          "candidatesTokenCount": len(reply) // 4 or 1}
+            data = f"data: {json.dumps(event)}\n\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class _GeminiChunk:
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=usage.get("promptTokenCount", 0),
+            candidates_token_count=usage.get("candidatesTokenCount", 0),
+        ) if usage else None
+
+
+class GeminiStubModel:
+    # Enough of google.generativeai.GenerativeModel for the pipeline:
+    # `model_name` and generate_content(prompt, stream=True).
+    def __init__(self, base_url, model_name="stub-gemini"):
+        self.base_url = base_url
+        self.model_name = model_name
+
+    def generate_content(self, prompt, stream=False):
+        from http_client import get_client
+        response = get_client().post(
+            "default",
+            f"{self.base_url}/v1beta/models/{self.model_name}:streamGenerateContent?alt=sse",
+            json={"contents": [{"parts": [{"text": prompt}]}]},
+            stream=True,
+        )
+        chunks = self._chunks(response)
+        return chunks if stream else [_GeminiChunk("".join(c.text for c in chunks))]
+
+    @staticmethod
+    def _chunks(response):
+        with response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith("data: "):
+                    event = json.loads(line[len("data: "):])
+                    parts = event["candidates"][0]["content"]["parts"]
+                    yield _GeminiChunk("".join(part.get("text", "") for part in parts),
+                                       event.get("usageMetadata"))
+
+
+class GeminiStub(_StubServer):
+    # Mimics Gemini's streamGenerateContent (SSE), replying with `reply` in
+    # a ```python fence, 16 characters per chunk, `delay` seconds apart.
+    # Partial refinement prompts get the requested lines of `reply`; the
+    # last chunk carries usageMetadata with roughly estimated token counts.
+    handler = _GeminiHandler
+
+    def __init__(self, reply="print('hello')", delay=0.0, port=0):
+        super().__init__(port)
+        self.reply = reply
+        self.delay = delay
+
+    def model(self, model_name="stub-gemini"):
+        return GeminiStubModel(self.url, model_name)
@@ -0,0 +1,181 @@
+import atexit
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from procs import worker_context
+
+DEFAULT_JOBS_PER_WORKER = 200
+DEFAULT_QUEUE_DEPTH = 32
+# How long a caller that must stay responsive (the app, the job API) waits
+# for a queue slot before PoolBusy.
+SUBMIT_TIMEOUT = float(os.environ.get("PODEZ_OCR_SUBMIT_TIMEOUT", 2))
+
+
+class PoolBusy(RuntimeError):
+    pass
+
+
+# Per-worker state. tesserocr is the intended backend: the engine (and its
+# traineddata) stays loaded in the worker between jobs. Without it the pool
+# falls back to pytesseract, which still starts a tesseract process per
+# call; only the Python side is kept warm.
+_engines = {}
+
+
+def _init_worker():
+    # One core per worker: stop tesseract's OpenMP from fanning out and
+    # fighting the other workers for the same cores.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _engine(lang, profile):
+    key = (lang, profile)
+    if key not in _engines:
+        try:
+            import tesserocr
+        except ImportError:
+            _engines[key] = None
+        else:
+            kwargs = {"lang": lang}
+            if profile is not None:
+                kwargs.update(psm=profile.psm, variables=profile.variables())
+                if profile.oem is not None:
+                    kwargs["oem"] = profile.oem
+                if profile.tessdata_dir:
+                    kwargs["path"] = profile.tessdata_dir
+            _engines[key] = tesserocr.PyTessBaseAPI(**kwargs)
+    return _engines[key]
+
+
+def _recognize(image_bytes, lang, config, profile=None):
+    from PIL import Image
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        api = _engine(lang, profile)
+        if api is not None and not config:
+            api.SetImage(image)
+            text = api.GetUTF8Text()
+        else:
+            import pytesseract
+            if profile is not None:
+                config = f"{profile.config()} {config}".strip()
+            text = pytesseract.image_to_string(image, lang=lang, config=config)
+        return text.strip(), None
+    except Exception as e:
+        return "", f"⚠️ Tesseract OCR failed: {e}"
+
+
+def _recognize_layout(image_bytes, lang, profile=None):
+    # Word boxes in image_to_data's dict-of-lists shape, from either backend.
+    from PIL import Image
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        api = _engine(lang, profile)
+        if api is None:
+            import pytesseract
+            config = profile.config() if profile is not None else ""
+            return pytesseract.image_to_data(
+                image, lang=lang, config=config, output_type=pytesseract.Output.DICT
+            ), None
+        from tesserocr import RIL, iterate_level
+        api.SetImage(image)
+        api.Recognize()
+        keys = ("page_num", "block_num", "par_num", "line_num", "left", "top", "width", "height", "conf", "text")
+        data = {key: [] for key in keys}
+        line_num = 0
+        for word in iterate_level(api.GetIterator(), RIL.WORD):
+            if word.IsAtBeginningOf(RIL.TEXTLINE):
+                line_num += 1
+            box = word.BoundingBox(RIL.WORD)
+            if box is None:
+                continue
+            x1, y1, x2, y2 = box
+            for key, value in zip(keys, (1, 1, 1, line_num, x1, y1, x2 - x1, y2 - y1,
+                                         word.Confidence(RIL.WORD), word.GetUTF8Text(RIL.WORD) or "")):
+                data[key].append(value)
+        return data, None
+    except Exception as e:
+        return None, f"⚠️ Tesseract OCR failed: {e}"
+
+
+def _recognize_lines(line_images, lang, profile=None):
+    # One task per run of lines keeps the per-task overhead (and, without
+    # tesserocr, the per-call process start) off every single line.
+    texts = []
+    for image_bytes in line_images:
+        text, error = _recognize(image_bytes, lang, "", profile)
+        if error:
+            return [], error
+        texts.append(text)
+    return texts, None
+
+
+class TesseractPool:
+    def __init__(self, workers=None, jobs_per_worker=DEFAULT_JOBS_PER_WORKER,
+                 queue_depth=DEFAULT_QUEUE_DEPTH):
+        self.workers = workers or os.cpu_count() or 1
+        # forkserver keeps workers from inheriting the Streamlit server's
+        # memory and threads, and is required for max_tasks_per_child.
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=worker_context(),
+            initializer=_init_worker,
+            max_tasks_per_child=jobs_per_worker,
+        )
+        self._slots = threading.BoundedSemaphore(self.workers + queue_depth)
+
+    def submit(self, image_bytes, lang="eng", config="", profile=None, block=True, timeout=None):
+        return self._submit(block, timeout, _recognize, image_bytes, lang, config, profile)
+
+    def submit_lines(self, line_images, lang="eng", profile=None, block=True, timeout=None):
+        # Future of ([text per line], error).
+        return self._submit(block, timeout, _recognize_lines, line_images, lang, profile)
+
+    def submit_layout(self, image_bytes, lang="eng", profile=None, block=True, timeout=None):
+        # Future of (image_to_data dict, error).
+        return self._submit(block, timeout, _recognize_layout, image_bytes, lang, profile)
+
+    def _submit(self, block, timeout, func, *args):
+        if not self._slots.acquire(blocking=block, timeout=timeout if block else None):
+            raise PoolBusy("Tesseract pool queue is full")
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def recognize(self, image_bytes, lang="eng", config="", profile=None, block=True, timeout=None):
+        return self.submit(image_bytes, lang, config, profile, block, timeout).result()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TesseractPool(
+                workers=int(os.environ.get("PODEZ_OCR_WORKERS", 0)) or None,
+                jobs_per_worker=int(os.environ.get("PODEZ_OCR_JOBS_PER_WORKER", DEFAULT_JOBS_PER_WORKER)),
+                queue_depth=int(os.environ.get("PODEZ_OCR_QUEUE_DEPTH", DEFAULT_QUEUE_DEPTH)),
+            )
+            atexit.register(_pool.shutdown, False)
+        return _pool
+
+
+def shutdown_pool(wait=True):
+    # Stops the shared pool; the next get_pool() starts a fresh one.
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait)
@@ -0,0 +1,99 @@
+import builtins
+import keyword
+import os
+import shlex
+import string
+from dataclasses import dataclass, replace
+
+# Tesseract settings per kind of page. The stock settings assume prose
+# paragraphs; "code" reads each line as-is, restricts output to the ASCII
+# Python is written in and biases the dictionary towards keywords and
+# builtins.
+#
+# The fast (integer) LSTM models live in a separate tessdata directory;
+# point PODEZ_TESSDATA_FAST at it. Without it, fast profiles fall back to
+# the installed models.
+
+PYTHON_CHARS = "".join(ch for ch in string.printable if not ch.isspace())
+PYTHON_WORDS = sorted(set(keyword.kwlist) | {name for name in dir(builtins) if not name.startswith("_")})
+TESSDATA_FAST = os.environ.get("PODEZ_TESSDATA_FAST")
+
+
+@dataclass(frozen=True)
+class TesseractProfile:
+    name: str
+    psm: int = 3
+    oem: int = None
+    whitelist: str = None
+    user_words: bool = False
+    fast: bool = False
+
+    @property
+    def tessdata_dir(self):
+        return TESSDATA_FAST if self.fast and TESSDATA_FAST else None
+
+    def variables(self):
+        variables = {}
+        if self.whitelist:
+            variables["tessedit_char_whitelist"] = self.whitelist
+        if self.psm != 3:
+            # Keep runs of spaces inside a line; a uniform block is code.
+            variables["preserve_interword_spaces"] = "1"
+        if self.user_words:
+            variables["user_words_file"] = user_words_path()
+        return variables
+
+    def config(self):
+        # Command line flags for pytesseract.
+        args = [f"--psm {self.psm}"]
+        if self.oem is not None:
+            args.append(f"--oem {self.oem}")
+        if self.tessdata_dir:
+            args.append(f"--tessdata-dir {shlex.quote(self.tessdata_dir)}")
+        for name, value in self.variables().items():
+            args.append(f"-c {name}={shlex.quote(value)}")
+        return " ".join(args)
+
+    def cache_config(self):
+        # What the OCR cache keys on: the settings, not the word list path.
+        return {"psm": self.psm, "oem": self.oem, "whitelist": self.whitelist,
+                "user_words": self.user_words, "fast": bool(self.tessdata_dir)}
+
+
+PROFILES = {
+    "default": TesseractProfile("default"),
+    # Uniform block of text, LSTM only.
+    "code": TesseractProfile("code", psm=6, oem=1, whitelist=PYTHON_CHARS, user_words=True),
+}
+PROFILES["code-fast"] = replace(PROFILES["code"], name="code-fast", fast=True)
+
+
+def line_profile(profile):
+    # The same settings for a single text line (line-band OCR).
+    return replace(profile, name=f"{profile.name}-line", psm=7)
+
+
+def user_words_path():
+    from ocr_cache import CACHE_DIR
+    path = os.path.join(CACHE_DIR, "python.user-words")
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(PYTHON_WORDS) + "\n")
+        os.replace(tmp, path)
+    return path
+
+
+_current = os.environ.get("PODEZ_TESSERACT_PROFILE", "code")
+
+
+def get_profile():
+    return PROFILES[_current]
+
+
+def set_profile(name):
+    global _current
+    if name not in PROFILES:
+        raise ValueError(f"Unknown Tesseract profile {name!r}; choose from {sorted(PROFILES)}")
+    _current = name
@@ -0,0 +1,43 @@
+from local_repair import fast_path, repair
+
+
+def test_fixes_misread_digits():
+    assert repair("x = 1O") == "x = 10"
+    assert repair("y = 2l + 3I") == "y = 21 + 31"
+
+
+def test_leaves_identifiers_with_digits():
+    text = "l1 = [1, 2]\nO2 = I3 = 0\nfor x in l1:\n    print(x, O2, I3)"
+    assert repair(text) == text
+
+
+def test_identifier_fix_does_not_change_program():
+    code = fast_path("l1 = [1, 2]\nfor x in l1\n    print(x)")
+    assert code == "l1 = [1, 2]\nfor x in l1:\n    print(x)"
+
+
+def test_leaves_strings_and_comments():
+    text = 's = "page 1O"  # 1O\nt = """\nif r is negative\npage 1O\n"""'
+    assert repair(text) == text
+
+
+def test_adds_missing_block_colons():
+    assert repair("for i in range(3)\n    print(i)") == "for i in range(3):\n    print(i)"
+    assert repair("if x == 1  # check\n    y = 2") == "if x == 1: # check\n    y = 2"
+
+
+def test_leaves_one_line_blocks():
+    text = "if x: y = 1\nelse: y = 2\nwhile n := f(): pass"
+    assert repair(text) == text
+
+
+def test_leaves_comprehension_clauses():
+    text = "squares = [\n    x * x\n    for x in xs\n    if x > 0\n]"
+    assert repair(text) == text
+
+
+def test_keeps_colon_only_where_it_clears_the_error():
+    # "else" starts a name here; the line compiles as it is.
+    text = "elsewhere = 1\nif_ok = 2"
+    assert repair(text) == text
+    assert repair("def f()\n    return 1") == "def f():\n    return 1"
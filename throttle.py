@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution: the first
+    # caller runs `fn`, the rest block on its result.
+    def __init__(self):
+        self.shared = 0
+        self._calls = {}
+        self._followers = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self._followers[key] = 0
+            else:
+                self.shared += 1
+                self._followers[key] += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._calls.get(key) is future:
+                    del self._calls[key]
+                    del self._followers[key]
+
+    def detach(self, key):
+        # For a leader that wants to give up: True if nobody else is waiting
+        # on `key`, in which case later callers start a flight of their own
+        # instead of joining this one.
+        with self._lock:
+            if key not in self._calls or self._followers[key]:
+                return False
+            del self._calls[key]
+            del self._followers[key]
+            return True
+
+
+class TokenBucket:
+    # `rate` tokens per second up to `capacity`. Callers reserve a token
+    # up front; the balance may go negative, which queues them in arrival
+    # order, each sleeping until its token has accrued.
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait=None):
+        # Seconds until the reserved token is ready, or None (nothing
+        # reserved) when that would take longer than max_wait.
+        with self._lock:
+            self._refill()
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                self.throttled += 1
+                return None
+            self.tokens -= 1
+            return wait
+
+    def acquire(self, max_wait=None):
+        wait = self.reserve(max_wait)
+        if wait is None:
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+    def refund(self):
+        # A reserved token that ended up unused.
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def drain(self):
+        # The server says we are over quota: forget any burst allowance.
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+
+    @property
+    def queued(self):
+        with self._lock:
+            self._refill()
+            return max(0, int(-self.tokens + 0.999))
@@ -1,6 +1,5 @@
 import streamlit as st
-import requests
-from PIL import Image, ImageOps
+from PIL import Image
 import io
 import google.generativeai as genai
 import toml
@@ -8,6 +7,9 @@ import sys
 import re
 import pytesseract
 import builtins
+from http_client import get_client
+from ocr_cache import cached_ocr
+from preprocess import preprocess_image
 
 @st.cache_resource(show_spinner=False)
 def load_gemini_api_key():
@@ -18,16 +20,7 @@ def load_gemini_api_key():
         st.error(f"Error loading AI API key: {e}")
         return None
 
-def preprocess_image(image_bytes):
-    image = Image.open(io.BytesIO(image_bytes))
-    image = ImageOps.exif_transpose(image)
-    image = image.convert("RGB")
-    image.thumbnail((1024, 1024))
-    output = io.BytesIO()
-    image.save(output, format="PNG")
-    return output.getvalue()
-
-@st.cache_data(show_spinner=False)
+@cached_ocr("ocr.space", {"language": "eng"})
 def ocr_space_extract(image_bytes):
     url = "https://api.ocr.space/parse/image"
     payload = {
@@ -39,7 +32,7 @@ def ocr_space_extract(image_bytes):
         'file': ('image.png', image_bytes, 'image/png')
     }
     try:
-        response = requests.post(url, data=payload, files=files, timeout=15)
+        response = get_client().post("ocr.space", url, data=payload, files=files)
         result = response.json()
     except Exception:
         return "", "⚠️ OCR.space API failed or exceeded limit."
@@ -47,7 +40,7 @@ def ocr_space_extract(image_bytes):
         return "", "⚠️ OCR did not return enough valid code to process."
     return result["ParsedResults"][0].get("ParsedText", "").strip(), None
 
-@st.cache_data(show_spinner=False)
+@cached_ocr("tesseract", {"lang": "eng"})
 def tesseract_extract(image_bytes):
     try:
         image = Image.open(io.BytesIO(image_bytes))
@@ -57,7 +50,11 @@ def tesseract_extract(image_bytes):
         return "", f"⚠️ Tesseract OCR failed: {e}"
 
 def extract_text_from_image(image_bytes, engine="OCR.space"):
-    if engine == "OCR.space":
+    try:
+        image_bytes = preprocess_image(image_bytes)
+    except Exception as e:
+        return "", f"⚠️ Could not read image: {e}"
+    if engine.startswith("OCR.space"):
         return ocr_space_extract(image_bytes)
     else:
         return tesseract_extract(image_bytes)
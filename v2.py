@@ -1,115 +1,100 @@
+from itertools import zip_longest
+
 import streamlit as st
-import requests
-from PIL import Image, ImageOps
-import io
-import google.generativeai as genai
-import toml
-import sys
-import re
-import pytesseract
-import builtins
+import metrics
+from analysis import analyze
+from batch import BatchItem, build_archive, iter_batch_inputs, run_batch
+from pipeline import (
+    ENGINES,
+    create_model,
+    extract_text_from_image,
+    load_gemini_api_key as read_gemini_api_key,
+    preprocess_image,
+    refine_code,
+    stream_python_code,
+)
+
+ENGINE_OPTIONS = {
+    "OCR.space(API)": "ocr.space",
+    "Tesseract(Model)": "tesseract",
+    "Tesseract lines(Long pages)": "tesseract-lines",
+    "Tesseract layout(Keeps indentation)": "tesseract-layout",
+    "Race(Best of all)": "race",
+}
 
 @st.cache_resource(show_spinner=False)
 def load_gemini_api_key():
     try:
-        secrets = toml.load("secrets.toml")
-        return secrets.get("GEMINI_API_KEY")
+        return read_gemini_api_key()
     except Exception as e:
         st.error(f"Error loading AI API key: {e}")
         return None
 
-def preprocess_image(image_bytes):
-    image = Image.open(io.BytesIO(image_bytes))
-    image = ImageOps.exif_transpose(image)
-    image = image.convert("RGB")
-    image.thumbnail((1024, 1024))
-    output = io.BytesIO()
-    image.save(output, format="PNG")
-    return output.getvalue()
-
-@st.cache_data(show_spinner=False)
-def ocr_space_extract(image_bytes):
-    url = "https://api.ocr.space/parse/image"
-    payload = {
-        'apikey': 'helloworld',
-        'language': 'eng',
-        'isOverlayRequired': False
-    }
-    files = {
-        'file': ('image.png', image_bytes, 'image/png')
-    }
-    try:
-        response = requests.post(url, data=payload, files=files, timeout=15)
-        result = response.json()
-    except Exception:
-        return "", "⚠️ OCR.space API failed or exceeded limit."
-    if result.get("IsErroredOnProcessing") or not result.get("ParsedResults"):
-        return "", "⚠️ OCR did not return enough valid code to process."
-    return result["ParsedResults"][0].get("ParsedText", "").strip(), None
-
-@st.cache_data(show_spinner=False)
-def tesseract_extract(image_bytes):
-    try:
-        image = Image.open(io.BytesIO(image_bytes))
-        text = pytesseract.image_to_string(image, lang="eng")
-        return text.strip(), None
-    except Exception as e:
-        return "", f"⚠️ Tesseract OCR failed: {e}"
-
-def extract_text_from_image(image_bytes, engine="OCR.space"):
-    if engine == "OCR.space":
-        return ocr_space_extract(image_bytes)
-    else:
-        return tesseract_extract(image_bytes)
-
-def execute_python_code(code: str, user_inputs: list):
-    output = io.StringIO()
-    error = None
-    try:
-        sys.stdout = output
-        input_iter = iter(user_inputs)
-        def patched_input(prompt=""):
-            st.write(f"Prompt: {prompt}")
-            return next(input_iter)
-        original_input = builtins.input
-        builtins.input = patched_input
-        exec(code, {"__builtins__": builtins.__dict__})
-        builtins.input = original_input
-    except Exception as e:
-        error = str(e)
-    finally:
-        sys.stdout = sys.__stdout__
-    return output.getvalue(), error
-
-def extract_input_prompts(code):
-    if not code:
-        return []
-    return re.findall(r'input\((.*?)\)', code)
-
-def refine_code_with_gemini(model, extracted_text):
-    prompt = f"""
-    Refine this Python code. Only correct syntax and structure errors.
-    DO NOT explain anything. DO NOT change logic or language. Just return valid Python code:
-    {extracted_text}
-    """
-    response = model.generate_content(prompt)
-    corrected_code = response.text or ""
-    code_blocks = re.findall(r"```(?:python)?\s*([\s\S]*?)```", corrected_code)
-    if code_blocks:
-        corrected_code = code_blocks[0].strip()
-    return corrected_code.strip()
+def render_metrics_sidebar():
+    # Only shown with PODEZ_METRICS=1; numbers are for this server process.
+    snapshot = metrics.snapshot()
+    with st.sidebar:
+        st.subheader("⏱️ Stage timings")
+        rows = [
+            {"stage": name, "count": s["count"],
+             "p50 ms": round(s["p50"] * 1000, 1), "p95 ms": round(s["p95"] * 1000, 1)}
+            for name, s in snapshot["spans"].items() if s["p50"] is not None
+        ]
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("No requests timed yet.")
+        if snapshot["counters"]:
+            st.subheader("Counters")
+            st.json(snapshot["counters"], expanded=False)
+
+def render_batch(api_key, engine):
+    uploaded_files = st.file_uploader(
+        "📤 Upload code images or a .zip",
+        type=["jpg", "jpeg", "png", "zip"],
+        accept_multiple_files=True,
+        key="batch_uploader"
+    )
+    if uploaded_files and st.button("⚙️ Process Batch"):
+        items = [BatchItem(name, data) for name, data in
+                 iter_batch_inputs((f.name, f.getvalue()) for f in uploaded_files)]
+        if not items:
+            st.warning("No images found in the upload.")
+            return
+        ocr = ENGINES[engine]
+        progress = st.progress(0.0, text="Processing...")
+        table = st.empty()
+        for _ in run_batch(items, preprocess_image, ocr, lambda text: refine_code(text, lambda: create_model(api_key))[0]):
+            done = sum(i.finished for i in items)
+            progress.progress(done / len(items), text=f"{done}/{len(items)} processed")
+            table.table([{"Image": i.name, "Status": i.stage, "Error": i.error or ""} for i in items])
+        st.session_state.batch_results = items
+
+    results = st.session_state.get("batch_results")
+    if results:
+        for item in results:
+            with st.expander(f"{'✅' if item.code else '⚠️'} {item.name}"):
+                if item.code:
+                    st.code(item.code, language="python")
+                else:
+                    st.warning(item.error)
+        st.download_button(
+            label="💾 Download All (.zip)",
+            data=build_archive(results),
+            file_name="refined_code.zip",
+            mime="application/zip"
+        )
 
 def main():
     st.set_page_config(page_title="DexRun Ai", layout="centered")
     st.title("✍️ DexRun Ai")
+    if metrics.enabled():
+        render_metrics_sidebar()
 
     GEMINI_API_KEY = load_gemini_api_key()
     if not GEMINI_API_KEY:
         st.stop()
 
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel(model_name="gemini-2.0-flash")
-
     if "refined_code" not in st.session_state:
         st.session_state.refined_code = None
     if "user_code" not in st.session_state:
@@ -117,15 +102,20 @@ def main():
     if "last_uploaded_filename" not in st.session_state:
         st.session_state.last_uploaded_filename = None
     if "ocr_engine" not in st.session_state:
-        st.session_state.ocr_engine = "OCR.space"
+        st.session_state.ocr_engine = "ocr.space"
 
-    st.session_state.ocr_engine = st.radio(
+    engine_label = st.radio(
         "Choose OCR Engine:",
-        options=["OCR.space(API)", "Tesseract(Model)"],
+        options=list(ENGINE_OPTIONS),
         index=0,
         horizontal=True,
         key="ocr_engine_radio"
     )
+    st.session_state.ocr_engine = ENGINE_OPTIONS[engine_label]
+
+    if st.checkbox("📚 Batch mode (multiple images or a .zip)", key="batch_mode"):
+        render_batch(GEMINI_API_KEY, st.session_state.ocr_engine)
+        return
 
     uploaded_file = st.file_uploader("📤 Upload a code image", type=["jpg", "jpeg", "png"])
     if uploaded_file:
@@ -133,7 +123,8 @@ def main():
             st.session_state.last_uploaded_filename = uploaded_file.name
             st.session_state.last_ocr_engine = st.session_state.ocr_engine
             st.image(uploaded_file, caption="Uploaded Image", use_container_width=True)
-            image_bytes = uploaded_file.read()
+            with metrics.span("upload.read"):
+                image_bytes = uploaded_file.read()
             extracted_text, ocr_error = extract_text_from_image(image_bytes, st.session_state.ocr_engine)
             if ocr_error:
                 st.warning(ocr_error)
@@ -144,9 +135,17 @@ def main():
             st.write("### 🧾 OCR Extracted Code:")
             st.code(extracted_text, language="python")
             with st.spinner("Refining code with Ai..."):
-                corrected_code = refine_code_with_gemini(model, extracted_text)
+                live_code = st.empty()
+                corrected_code, used_llm = refine_code(
+                    extracted_text,
+                    lambda: create_model(GEMINI_API_KEY),
+                    on_chunk=lambda code: live_code.code(code, language="python")
+                )
+                live_code.empty()
                 st.session_state.refined_code = corrected_code
                 st.session_state.user_code = corrected_code
+            if not used_llm:
+                st.caption("⚡ OCR output compiled after local repair; Ai refinement skipped.")
         else:
             st.image(uploaded_file, caption="Uploaded Image", use_container_width=True)
 
@@ -161,23 +160,57 @@ def main():
         if editable_code != st.session_state.user_code:
             st.session_state.user_code = editable_code
 
-        input_prompts = extract_input_prompts(st.session_state.user_code)
+        analysis = analyze(st.session_state.user_code or "")
         user_inputs = []
-        if input_prompts:
+        if analysis.syntax_error:
+            st.warning(f"⚠️ Code does not compile: {analysis.syntax_error}")
+        if analysis.inputs:
             st.warning("⚠️ Code has input() statements. Provide values below.")
-            for idx, prompt in enumerate(input_prompts):
-                safe_prompt = prompt.strip("'\"")
-                value = st.text_input(f"Input {idx + 1} - {safe_prompt}", key=f"input_{idx}")
-                user_inputs.append(value)
+            # input() calls in the same loop take turns: the program reads the
+            # first value of each box, then the second of each, and so on.
+            groups = []
+            for idx, call in enumerate(analysis.inputs):
+                if call.in_loop and groups and groups[-1][0] == call.loop:
+                    groups[-1][1].append((idx, call))
+                else:
+                    groups.append((call.loop if call.in_loop else None, [(idx, call)]))
+            for loop, calls in groups:
+                if loop is None:
+                    idx, call = calls[0]
+                    label = f"Input {idx + 1} - {call.prompt.strip() or f'line {call.lineno}'}"
+                    user_inputs.append(st.text_input(label, key=f"input_{idx}"))
+                    continue
+                if len(calls) > 1:
+                    st.caption(f"The loop at line {loop} asks for {len(calls)} values per pass; "
+                               "line N of each box is used in pass N.")
+                columns = []
+                for idx, call in calls:
+                    label = f"Input {idx + 1} - {call.prompt.strip() or f'line {call.lineno}'}"
+                    value = st.text_area(f"{label} (inside a loop: one value per line)", key=f"input_{idx}")
+                    columns.append(value.splitlines())
+                for row in zip_longest(*columns):
+                    user_inputs.extend(value for value in row if value is not None)
 
         if st.button("🚀 Run Code"):
             if st.session_state.user_code:
-                output, error = execute_python_code(st.session_state.user_code, user_inputs)
                 st.write("### 🖥️ Output:")
+                output_box = st.empty()
+                output = ""
+                error = None
+                for kind, payload in stream_python_code(st.session_state.user_code, user_inputs):
+                    if kind == "cached":
+                        st.caption("⚡ Cached result: this code already ran with these inputs.")
+                    elif kind == "prompt":
+                        st.write(f"Prompt: {payload}")
+                    elif kind == "done":
+                        error = payload
+                    else:
+                        output += payload
+                        output_box.code(output)
                 if error:
                     st.error(f"Error: {error}")
-                else:
-                    st.code(output or "No output.")
+                elif not output:
+                    output_box.code("No output.")
             else:
                 st.warning("No code to execute.")
 